@@ -1,20 +1,11 @@
 import os
-import sqlite3
 
-CONFIG_DIR = 'config'
-LOCALDB_FILE = os.path.join(CONFIG_DIR, 'localdb.sqlite')
+from db import LOCALDB_FILE
+from migrations import MIGRATIONS, migrate
 
 if os.path.exists(LOCALDB_FILE):
-    conn = sqlite3.connect(LOCALDB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(sell_history)")
-    columns = [row[1] for row in cursor.fetchall()]
-    if 'cost_price' not in columns:
-        cursor.execute("ALTER TABLE sell_history ADD COLUMN cost_price REAL DEFAULT 0")
-        conn.commit()
-        print('Added cost_price column to sell_history.')
-    else:
-        print('cost_price column already exists in sell_history.')
-    conn.close()
+    # The cost_price column is now the first step of the migration runner
+    version = migrate()
+    print(f'localdb.sqlite is at schema version {version} of {len(MIGRATIONS)}.')
 else:
     print('localdb.sqlite does not exist.') 
\ No newline at end of file
@@ -0,0 +1,260 @@
+import queue
+import sqlite3
+import threading
+
+# Number of compiled statements kept per connection by the sqlite3 module
+STATEMENT_CACHE_SIZE = 256
+DEFAULT_POOL_SIZE = 4
+# Seconds a thread waits for a pooled connection before giving up
+DEFAULT_POOL_TIMEOUT = 30
+# Primary result codes of sqlite3 errors worth retrying: another connection holds the lock
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+# SQLSTATE of a SQL Server deadlock victim, whose transaction was rolled back
+SERIALIZATION_FAILURE = '40001'
+
+# A backend opens connections and supplies the few pieces of SQL the engines disagree on.
+# Connections offer execute/executemany returning DB-API cursors with qmark parameters,
+# so everything else in repository, rollups and profit is the same SQL on every engine.
+
+class PoolTimeout(Exception):
+    pass
+
+class ConnectionPool:
+    # At most size connections open at once; released connections are kept for the next thread
+    def __init__(self, connect, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT, ping=None):
+        self.connect = connect
+        self.timeout = timeout
+        self.ping = ping
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = queue.LifoQueue()
+
+    def acquire(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f'No database connection free after {self.timeout} seconds')
+        try:
+            while True:
+                try:
+                    conn = self.idle.get_nowait()
+                except queue.Empty:
+                    return self.connect()
+                if self.alive(conn):
+                    return conn
+                self.discard(conn)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def alive(self, conn):
+        # A connection the server dropped while idle is replaced rather than handed out
+        if self.ping is None:
+            return True
+        try:
+            self.ping(conn)
+            return True
+        except Exception:
+            return False
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def release(self, conn):
+        self.idle.put(conn)
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.discard(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+class SQLiteBackend:
+    # One local database file; each thread opens its own connection
+    name = 'sqlite'
+    pooled = False
+    integrity_errors = (sqlite3.IntegrityError,)
+    substr = 'substr'
+
+    def __init__(self, file_name, pragmas=None):
+        self.file_name = file_name
+        self.pragmas = dict(pragmas or {})
+
+    def open(self):
+        conn = sqlite3.connect(self.file_name, isolation_level=None, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def connect(self):
+        return self.open()
+
+    def release(self, conn):
+        conn.close()
+
+    def close(self):
+        pass
+
+    def begin(self, conn, immediate=False):
+        # immediate takes the write lock up front instead of at the first write
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+
+    def commit(self, conn):
+        conn.execute('COMMIT')
+
+    def rollback(self, conn):
+        # A failed COMMIT may already have ended the transaction
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+
+    def page(self, limit, offset=0):
+        # Clause following ORDER BY, and its parameters
+        return 'LIMIT ? OFFSET ?', (limit, offset)
+
+    def insert(self, conn, sql, params):
+        # Runs an INSERT and returns the new row's id
+        return conn.execute(sql, params).lastrowid
+
+    def add_totals(self, conn, table, keys, columns, rows):
+        # Inserts rows of keys + columns, adding columns onto an existing row with the same keys
+        names = ', '.join(keys + columns)
+        placeholders = ', '.join('?' * len(keys + columns))
+        updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in columns)
+        conn.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders}) "
+                         f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}", rows)
+
+    def schema_version(self, conn):
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def set_schema_version(self, conn, version):
+        conn.execute(f'PRAGMA user_version = {int(version)}')
+
+    def is_busy(self, error):
+        # Also true for BUSY_SNAPSHOT, when a deferred transaction read a version another till has since replaced
+        if not isinstance(error, sqlite3.OperationalError):
+            return False
+        code = getattr(error, 'sqlite_errorcode', None)
+        if code is None:
+            # Before Python 3.11 only the message tells
+            return 'locked' in str(error)
+        return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+
+class SharedSQLiteBackend(SQLiteBackend):
+    # SQLite file standing in for a central server: pooled connections handed out
+    # the way SqlServerBackend does, with SQLite SQL. For trying multi-till setups locally.
+    pooled = True
+
+    def __init__(self, file_name, pragmas=None, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT):
+        super().__init__(file_name, pragmas)
+        self.pool = ConnectionPool(self.open, pool_size, timeout, ping=lambda conn: conn.execute('SELECT 1'))
+
+    def connect(self):
+        return self.pool.acquire()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        self.pool.release(conn)
+
+    def close(self):
+        self.pool.close()
+
+class ServerConnection:
+    # pyodbc connection with the sqlite3-style execute/executemany shortcuts the queries use
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=()):
+        cursor = self.conn.cursor()
+        cursor.execute(sql, *params)
+        return cursor
+
+    def executemany(self, sql, rows):
+        cursor = self.conn.cursor()
+        rows = list(rows)
+        if rows:
+            # Sends all parameter sets in one round trip instead of one per row
+            cursor.fast_executemany = True
+            cursor.executemany(sql, rows)
+        return cursor
+
+    def close(self):
+        self.conn.close()
+
+class SqlServerBackend:
+    # Central SQL Server database shared by every till, reached through pyodbc
+    name = 'sqlserver'
+    pooled = True
+    substr = 'SUBSTRING'
+
+    def __init__(self, connection_string, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT):
+        import pyodbc
+        self.pyodbc = pyodbc
+        self.integrity_errors = (pyodbc.IntegrityError,)
+        self.connection_string = connection_string
+        self.pool = ConnectionPool(self.open, pool_size, timeout, ping=lambda conn: conn.execute('SELECT 1').fetchone())
+
+    def open(self):
+        # Autocommit outside transaction(), so an idle pooled connection never holds locks
+        return ServerConnection(self.pyodbc.connect(self.connection_string, autocommit=True))
+
+    def connect(self):
+        return self.pool.acquire()
+
+    def release(self, conn):
+        if not conn.conn.autocommit:
+            self.rollback(conn)
+        self.pool.release(conn)
+
+    def close(self):
+        self.pool.close()
+
+    def begin(self, conn, immediate=False):
+        conn.conn.autocommit = False
+        if immediate:
+            # Serialises writers the way BEGIN IMMEDIATE does on SQLite; released at commit or rollback
+            conn.execute("EXEC sp_getapplock @Resource = 'inventory_write', @LockMode = 'Exclusive', "
+                         "@LockOwner = 'Transaction'")
+
+    def commit(self, conn):
+        conn.conn.commit()
+        conn.conn.autocommit = True
+
+    def rollback(self, conn):
+        conn.conn.rollback()
+        conn.conn.autocommit = True
+
+    def page(self, limit, offset=0):
+        return 'OFFSET ? ROWS FETCH NEXT ? ROWS ONLY', (offset, limit)
+
+    def insert(self, conn, sql, params):
+        cursor = conn.execute(f'{sql}; SELECT CAST(SCOPE_IDENTITY() AS INT)', params)
+        cursor.nextset()
+        return cursor.fetchone()[0]
+
+    def add_totals(self, conn, table, keys, columns, rows):
+        names = keys + columns
+        placeholders = ', '.join('?' * len(names))
+        matches = ' AND '.join(f'target.{key} = source.{key}' for key in keys)
+        updates = ', '.join(f'{column} = target.{column} + source.{column}' for column in columns)
+        conn.executemany(f'''MERGE {table} WITH (HOLDLOCK) AS target
+            USING (VALUES ({placeholders})) AS source ({', '.join(names)})
+            ON {matches}
+            WHEN MATCHED THEN UPDATE SET {updates}
+            WHEN NOT MATCHED THEN INSERT ({', '.join(names)}) VALUES ({', '.join(f'source.{name}' for name in names)});''',
+            rows)
+
+    def schema_version(self, conn):
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+        return row[0] or 0
+
+    def set_schema_version(self, conn, version):
+        conn.execute('DELETE FROM schema_version')
+        conn.execute('INSERT INTO schema_version (version) VALUES (?)', (int(version),))
+
+    def is_busy(self, error):
+        return isinstance(error, self.pyodbc.Error) and bool(error.args) and error.args[0] == SERIALIZATION_FAILURE
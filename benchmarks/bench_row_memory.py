@@ -0,0 +1,55 @@
+"""Memory and iteration cost of sell history rows held as dicts, __slots__ objects and namedtuples.
+
+Run from the repository root: python benchmarks/bench_row_memory.py [rows]
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository import SELL_HISTORY_COLUMNS, SaleRecord
+
+FIELDS = SaleRecord._fields
+
+def as_dict(row):
+    # The per-row dict load_sell_history used to build
+    return dict(zip(FIELDS, row))
+
+class SlotsRecord:
+    __slots__ = FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(FIELDS, values):
+            setattr(self, field, value)
+
+def raw_rows(count):
+    for i in range(count):
+        yield (i, f'Item {i % 500}', 1 + i % 5, 250.0, 500.0, None, 10.0, 50.0, 450.0,
+               f'2026-01-{1 + i % 28:02d} 10:00:00', f'Customer {i % 3000}', f'{9000000000 + i % 3000}', 300.0)
+
+def measure(label, build, total, rows):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = [build(row) for row in raw_rows(rows)]
+    built = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    grand_total = total(records)
+    iterated = time.perf_counter() - start
+    print(f'{label:>10}: {size / rows:6.0f} B/row   {size / 2 ** 20:7.1f} MiB   '
+          f'build {built * 1000:7.1f} ms   sum {iterated * 1000:6.1f} ms   ({grand_total:.0f})')
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    print(f'{rows} rows of {len(FIELDS)} columns ({SELL_HISTORY_COLUMNS})')
+    measure('dict', as_dict, lambda records: sum(r['final_total'] for r in records), rows)
+    measure('__slots__', lambda row: SlotsRecord(*row), lambda records: sum(r.final_total for r in records), rows)
+    measure('namedtuple', SaleRecord._make, lambda records: sum(r.final_total for r in records), rows)
+
+if __name__ == '__main__':
+    main()
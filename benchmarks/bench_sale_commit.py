@@ -0,0 +1,58 @@
+"""Sale-commit latency with SQLite's defaults versus config/storage.json settings.
+
+Run from the repository root: python benchmarks/bench_sale_commit.py [sales]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from checkout import cart_line, checkout
+from migrations import migrate
+from repository import load_inventory
+from storage import DEFAULT_STORAGE_CONFIG
+
+SCHEMA = '''
+CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password TEXT, role TEXT);
+CREATE TABLE inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, quantity INTEGER, price REAL, barcode TEXT, cost_price REAL DEFAULT 0
+);
+CREATE TABLE sell_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, quantity_sold INTEGER, price REAL, total_sale REAL, discount REAL,
+    discount_percent REAL, discount_price REAL, final_total REAL, timestamp TEXT, customer_name TEXT,
+    contact_number TEXT, cost_price REAL DEFAULT 0
+);
+'''
+
+def run(label, pragmas, sales, folder):
+    db.LOCALDB_FILE = os.path.join(folder, f'{label}.sqlite')
+    db.configure(pragmas)
+    conn = db.get_connection()
+    conn.executescript(SCHEMA)
+    migrate()
+    conn.execute("INSERT INTO inventory (name, quantity, price, cost_price) VALUES ('Shirt', ?, 500, 300)", (sales,))
+    items = {item.id: item for item in load_inventory()}
+    item = items[1]
+    timings = []
+    for _ in range(sales):
+        lines = [cart_line(item, 1, 500)]
+        start = time.perf_counter()
+        checkout(lines, items, 'Bench Customer', '9999999999')
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f'{label:>8}: median {statistics.median(timings):7.3f} ms   '
+          f'p95 {timings[int(len(timings) * 0.95)]:7.3f} ms   total {sum(timings):8.1f} ms')
+    db.close_all()
+
+def main():
+    sales = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as folder:
+        run('default', {}, sales, folder)
+        run('tuned', DEFAULT_STORAGE_CONFIG['pragmas'], sales, folder)
+
+if __name__ == '__main__':
+    main()
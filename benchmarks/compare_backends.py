@@ -0,0 +1,143 @@
+"""The same repository calls against SQLiteBackend and SharedSQLiteBackend, with results compared.
+
+SharedSQLiteBackend stands in for a central server by handing out pooled connections the way
+SqlServerBackend does. This runs one scripted session on each: stock added and edited, sales
+checked out (some refused), rollup totals, sell history paging, a customer rename and a CSV
+import on a background thread that hands its connection back. Every result must match.
+
+Run from the repository root: python benchmarks/compare_backends.py
+Exits with status 1 if the backends disagree.
+"""
+import datetime
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from backends import SharedSQLiteBackend, SQLiteBackend
+from checkout import CheckoutError, cart_line, checkout
+from migrations import migrate
+from repository import (
+    StaleItem, add_inventory_item, fetch_page, get_customer_name_by_contact, key_at_offset, load_inventory,
+    load_sell_history, query_sell_history, rename_customer, sell_history_cursor_at, update_inventory_item
+)
+from rollups import customer_period_totals, dashboard, period_totals
+from stock_import import import_inventory
+from storage import DEFAULT_STORAGE_CONFIG
+
+SCHEMA = '''
+CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password TEXT, role TEXT);
+CREATE TABLE inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, quantity INTEGER, price REAL, barcode TEXT, cost_price REAL DEFAULT 0
+);
+CREATE TABLE sell_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, quantity_sold INTEGER, price REAL, total_sale REAL, discount REAL,
+    discount_percent REAL, discount_price REAL, final_total REAL, timestamp TEXT, customer_name TEXT,
+    contact_number TEXT, cost_price REAL DEFAULT 0
+);
+'''
+ITEMS = 12
+SALES = 60
+CUSTOMERS = [('Ann Lee', '9000000001'), ('Bo Chan', '9000000002'), ('Cy Diaz', '9000000003')]
+PAGE_ROWS = 7
+
+class ImportJob:
+    # What import_inventory needs of a worker Job, without Tk
+    def progress(self, done, total=None):
+        pass
+
+def write_import_file(folder):
+    file_name = os.path.join(folder, 'stock.csv')
+    with open(file_name, 'w', newline='', encoding='utf-8') as f:
+        f.write('name,quantity,price,cost_price,barcode\n')
+        f.write('Item 1,5,10,6,\n')
+        f.write(',1,1,1,\n')
+        f.write('New item,3,2.5,,555\n')
+        f.write('Item 2,x,1,,\n')
+    return file_name
+
+def walk_history(sort, **filters):
+    # Every page of sell history through the cursor, as (page length, first id) pairs
+    pages, cursor = [], None
+    while True:
+        records, cursor = query_sell_history(cursor, limit=PAGE_ROWS, sort=sort, **filters)
+        pages.append((len(records), records[0].id if records else None))
+        if cursor is None:
+            return pages
+
+def run_import(file_name, results):
+    # On its own thread, as the worker runs it; a pooled connection must go back afterwards
+    try:
+        imported = import_inventory(ImportJob(), file_name)
+        results['import'] = (imported.inserted, imported.updated, imported.rejected)
+    finally:
+        db.release_connection()
+
+def session(folder):
+    results = {}
+    conn = db.get_connection()
+    conn.executescript(SCHEMA)
+    results['schema version'] = migrate()
+    for i in range(1, ITEMS + 1):
+        add_inventory_item(f'Item {i}', 25, 10.0 * i, 6.0 * i, f'B{i:03d}' if i % 2 else None)
+    item = load_inventory()[0]
+    update_inventory_item(item.id, item.name, 40, item.price, item.cost_price, item.barcode, version=item.version)
+    try:
+        update_inventory_item(item.id, item.name, 1, item.price, item.cost_price, item.barcode, version=item.version)
+        results['stale edit'] = 'written'
+    except StaleItem:
+        results['stale edit'] = 'refused'
+    outcomes = []
+    for sale in range(SALES):
+        items = {item.id: item for item in load_inventory()}
+        chosen = [items[(sale * 5 + n) % ITEMS + 1] for n in range(1 + sale % 3)]
+        lines = [cart_line(item, 1 + sale % 4, item.price, (sale * 7) % 30) for item in chosen]
+        customer_name, contact_number = CUSTOMERS[sale % len(CUSTOMERS)]
+        timestamp = f'2026-01-{1 + sale % 20:02d} {10 + sale % 8}:00:{sale % 60:02d}'
+        try:
+            outcomes.append(checkout(lines, items, customer_name, contact_number, timestamp))
+        except CheckoutError as e:
+            outcomes.append(str(e))
+    results['checkouts'] = outcomes
+    results['totals'] = [period_totals(), period_totals('2026-01-05', '2026-01-12'), period_totals('2026-02-01')]
+    results['customers'] = customer_period_totals('2026-01-03', '2026-01-15')
+    results['dashboard'] = dashboard(datetime.date(2026, 1, 10))
+    results['newest pages'] = walk_history('newest')
+    results['oldest pages'] = walk_history('oldest', customer_name='Bo Chan')
+    results['cursor at'] = sell_history_cursor_at(25)
+    results['inventory page'] = fetch_page('inventory', 'id, name', key_at_offset('inventory', 3), 4)
+    results['renamed'] = rename_customer('Cy Diaz', '9000000003', 'Ann Lee', '9000000001')
+    results['customers after rename'] = customer_period_totals()
+    results['contact name'] = get_customer_name_by_contact('9000000003')
+    thread = threading.Thread(target=run_import, args=(write_import_file(folder), results))
+    thread.start()
+    thread.join()
+    results['inventory'] = load_inventory()
+    results['history'] = load_sell_history()
+    return results
+
+def run(label, make_backend, folder):
+    file_name = os.path.join(folder, f'{label}.sqlite')
+    db.use_backend(make_backend(file_name))
+    try:
+        return session(folder)
+    finally:
+        db.use_backend(None)
+
+def main():
+    pragmas = DEFAULT_STORAGE_CONFIG['pragmas']
+    with tempfile.TemporaryDirectory() as folder:
+        local = run('local', lambda file_name: SQLiteBackend(file_name, pragmas), folder)
+        # One connection each for the main thread and the import thread
+        shared = run('shared', lambda file_name: SharedSQLiteBackend(file_name, pragmas, pool_size=2, timeout=5),
+                     folder)
+    different = [key for key in local if local[key] != shared.get(key)]
+    for key in local:
+        print(f"{key:>24}: {'differs' if key in different else 'same'}")
+    sys.exit(1 if different else 0)
+
+if __name__ == '__main__':
+    main()
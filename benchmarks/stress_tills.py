@@ -0,0 +1,150 @@
+"""Several till processes selling and restocking against one SQLite file at once.
+
+Each till sells random items through record_sales and now and then restocks one with a
+version-checked update_inventory_item, retrying when another till got there first. Afterwards
+every item's stock must equal its starting stock plus what was restocked minus what was sold,
+and sell_history and the daily rollup must hold exactly the sales the tills saw commit.
+
+Run from the repository root: python benchmarks/stress_tills.py [tills,...] [sales per till]
+Exits with status 1 if any check fails.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from checkout import cart_line
+from migrations import migrate
+from repository import OutOfStock, StaleItem, load_inventory, load_inventory_items, record_sales, update_inventory_item
+from storage import DEFAULT_STORAGE_CONFIG
+
+ITEMS = 20
+# One sale in this many is a restock instead
+RESTOCK_EVERY = 10
+RESTOCK_QUANTITY = 5
+SCHEMA = '''
+CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password TEXT, role TEXT);
+CREATE TABLE inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, quantity INTEGER, price REAL, barcode TEXT, cost_price REAL DEFAULT 0
+);
+CREATE TABLE sell_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, quantity_sold INTEGER, price REAL, total_sale REAL, discount REAL,
+    discount_percent REAL, discount_price REAL, final_total REAL, timestamp TEXT, customer_name TEXT,
+    contact_number TEXT, cost_price REAL DEFAULT 0
+);
+'''
+
+def connect(file_name):
+    db.LOCALDB_FILE = file_name
+    db.configure(DEFAULT_STORAGE_CONFIG['pragmas'])
+
+def restock(item_id):
+    # Read-modify-write of an absolute quantity: safe only because the version check refuses stale copies
+    conflicts = 0
+    while True:
+        item = load_inventory_items([item_id])[0]
+        try:
+            update_inventory_item(item.id, item.name, item.quantity + RESTOCK_QUANTITY, item.price, item.cost_price,
+                                  item.barcode, version=item.version)
+            return conflicts
+        except StaleItem:
+            conflicts += 1
+
+def till(number, file_name, sales, start, results):
+    connect(file_name)
+    items = {item.id: item for item in load_inventory()}
+    rng = random.Random(number)
+    sold = Counter()
+    restocked = Counter()
+    tally = Counter()
+    start.wait()
+    began = time.perf_counter()
+    for sale in range(sales):
+        if sale % RESTOCK_EVERY == RESTOCK_EVERY - 1:
+            item_id = rng.choice(list(items))
+            tally['version conflicts'] += restock(item_id)
+            restocked[item_id] += RESTOCK_QUANTITY
+            continue
+        lines = [cart_line(items[item_id], rng.randint(1, 3), items[item_id].price)
+                 for item_id in rng.sample(list(items), rng.randint(1, 2))]
+        try:
+            record_sales(lines, f'2026-01-01 10:{number % 60:02d}:00', f'Till {number}', f'{9000000000 + number}')
+        except OutOfStock:
+            tally['out of stock'] += 1
+            continue
+        tally['sales'] += 1
+        tally['lines'] += len(lines)
+        for line in lines:
+            sold[line['item_id']] += line['quantity']
+    results.put((time.perf_counter() - began, sold, restocked, tally))
+    db.close_all()
+
+def check(file_name, stock, sold, restocked, tally):
+    connect(file_name)
+    conn = db.get_connection()
+    failures = []
+    for item in load_inventory():
+        expected = stock + restocked[item.id] - sold[item.id]
+        if item.quantity != expected:
+            failures.append(f'{item.name}: stock {item.quantity}, expected {expected}')
+        history = conn.execute('SELECT COALESCE(SUM(quantity_sold), 0) FROM sell_history WHERE name = ?', (item.name,)).fetchone()[0]
+        rollup = conn.execute('SELECT COALESCE(SUM(quantity), 0) FROM daily_item_sales WHERE name = ?', (item.name,)).fetchone()[0]
+        if history != sold[item.id] or rollup != sold[item.id]:
+            failures.append(f'{item.name}: {sold[item.id]} sold, history has {history}, rollup has {rollup}')
+    rows = conn.execute('SELECT COUNT(*) FROM sell_history').fetchone()[0]
+    if rows != tally['lines']:
+        failures.append(f"{tally['lines']} sale lines committed, sell_history has {rows}")
+    db.close_all()
+    return failures
+
+def run(tills, sales, folder):
+    file_name = os.path.join(folder, f'tills_{tills}.sqlite')
+    connect(file_name)
+    db.get_connection().executescript(SCHEMA)
+    migrate()
+    # Less stock than the tills want, so some sales must be refused rather than oversold
+    stock = tills * sales * 2 // ITEMS
+    with db.transaction() as conn:
+        conn.executemany('INSERT INTO inventory (name, quantity, price, cost_price) VALUES (?, ?, 100, 60)',
+                         [(f'Item {i}', stock) for i in range(1, ITEMS + 1)])
+    db.close_all()
+    start = multiprocessing.Barrier(tills + 1)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=till, args=(number, file_name, sales, start, results))
+                 for number in range(1, tills + 1)]
+    for process in processes:
+        process.start()
+    start.wait()
+    began = time.perf_counter()
+    finished = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+    sold, restocked, tally = Counter(), Counter(), Counter()
+    for _, till_sold, till_restocked, till_tally in finished:
+        sold.update(till_sold)
+        restocked.update(till_restocked)
+        tally.update(till_tally)
+    failures = check(file_name, stock, sold, restocked, tally)
+    print(f"{tills:>3} tills: {tally['sales'] / elapsed:7.0f} sales/s   {tally['sales']:>6} sold   "
+          f"{tally['out of stock']:>5} out of stock   {tally['version conflicts']:>4} version conflicts   "
+          f"{'ok' if not failures else 'FAILED'}")
+    for failure in failures:
+        print(f'      {failure}')
+    return not failures
+
+def main():
+    tills = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1, 2, 4, 8]
+    sales = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    with tempfile.TemporaryDirectory() as folder:
+        passed = [run(count, sales, folder) for count in tills]
+    sys.exit(0 if all(passed) else 1)
+
+if __name__ == '__main__':
+    main()
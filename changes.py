@@ -0,0 +1,64 @@
+import threading
+import traceback
+
+# Changes are {table: ids} dicts; ids is a set of row ids, or None when the rows are not known
+# (a set-based UPDATE, or a commit made by another process). Subscribers are called on the
+# thread that committed, after the commit.
+WATCHED_TABLES = ('inventory', 'sell_history', 'users')
+
+_subscribers = []
+_lock = threading.Lock()
+
+def subscribe(callback):
+    with _lock:
+        _subscribers.append(callback)
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+def publish(changed):
+    if not changed:
+        return
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback in subscribers:
+        # The write has already committed; a failing subscriber must not look like it failed
+        try:
+            callback(changed)
+        except Exception:
+            traceback.print_exc()
+
+def merge(changed, table, ids=None):
+    # Adds ids of table to the changed dict in place; None for either side means unknown rows
+    if ids is None or (table in changed and changed[table] is None):
+        changed[table] = None
+    else:
+        changed.setdefault(table, set()).update(ids)
+    return changed
+
+class ChangeWatcher(threading.Thread):
+    # Polls PRAGMA data_version on a connection of its own, which changes whenever any other
+    # connection commits: other tills on a shared file, but also this process's own threads,
+    # whose commits are then reported a second time as unknown rows.
+    def __init__(self, open_connection, interval):
+        super().__init__(name='sqlite-change-watcher', daemon=True)
+        self.open_connection = open_connection
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = self.open_connection()
+        try:
+            version = conn.execute('PRAGMA data_version').fetchone()[0]
+            while not self.stopped.wait(self.interval):
+                current = conn.execute('PRAGMA data_version').fetchone()[0]
+                if current != version:
+                    version = current
+                    publish({table: None for table in WATCHED_TABLES})
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,54 @@
+import datetime
+import re
+
+from repository import OutOfStock, record_sales
+
+class CheckoutError(Exception):
+    pass
+
+def cart_line(item, quantity, price, discount_percent=0):
+    # One priced cart line for an inventory item
+    if quantity <= 0:
+        raise CheckoutError('Quantity must be positive!')
+    if discount_percent < 0 or discount_percent > 100:
+        raise CheckoutError('Discount percent must be between 0 and 100!')
+    total_sale = quantity * price
+    discount = (discount_percent / 100.0) * total_sale
+    return {
+        'item_id': item.id,
+        'name': item.name,
+        'cost_price': item.cost_price or 0,
+        'quantity': quantity,
+        'price': price,
+        'total_sale': total_sale,
+        'discount_percent': discount_percent,
+        'discount': discount,
+        'final_total': total_sale - discount
+    }
+
+def validate_customer(customer_name, contact_number):
+    if not customer_name:
+        raise CheckoutError('Customer name cannot be empty!')
+    if not re.fullmatch(r'[A-Za-z ]+', customer_name):
+        raise CheckoutError('Customer name must contain only alphabets and spaces!')
+    if not contact_number:
+        raise CheckoutError('Contact number cannot be empty!')
+    if not re.fullmatch(r'\d{10}', contact_number):
+        raise CheckoutError('Contact number must be exactly 10 digits!')
+
+def checkout(lines, items, customer_name, contact_number, timestamp=None):
+    # items maps item id to the inventory row the lines were priced from.
+    # Stock is only checked by the write's guarded decrement: items may be stale when other
+    # tills share the database, and would refuse a sale another till's restock made possible.
+    if not lines:
+        raise CheckoutError('The cart is empty!')
+    validate_customer(customer_name, contact_number)
+    for line in lines:
+        if items.get(line['item_id']) is None:
+            raise CheckoutError('Item not found!')
+    timestamp = timestamp or datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        record_sales(lines, timestamp, customer_name, contact_number)
+    except OutOfStock as e:
+        raise CheckoutError(f'Not enough {e.item_name} in stock!') from e
+    return timestamp
@@ -2,6 +2,9 @@ import json
 import os
 import pyodbc
 
+from migrations import MIGRATIONS
+from users import hash_password
+
 CONFIG_DIR = 'config'
 USERS_FILE = os.path.join(CONFIG_DIR, 'users.json')
 INVENTORY_FILE = os.path.join(CONFIG_DIR, 'inventory.json')
@@ -33,8 +36,8 @@ cursor.execute('''
 IF OBJECT_ID('users', 'U') IS NOT NULL DROP TABLE users;
 CREATE TABLE users (
     id INT PRIMARY KEY,
-    username NVARCHAR(100),
-    password NVARCHAR(100),
+    username NVARCHAR(100) NOT NULL UNIQUE,
+    password NVARCHAR(200),
     role NVARCHAR(50)
 )
 ''')
@@ -45,9 +48,12 @@ CREATE TABLE inventory (
     name NVARCHAR(100),
     quantity INT,
     price FLOAT,
-    barcode NVARCHAR(100)
+    barcode NVARCHAR(100),
+    cost_price FLOAT DEFAULT 0,
+    version INT NOT NULL DEFAULT 0
 )
 ''')
+cursor.execute('CREATE UNIQUE INDEX idx_inventory_barcode ON inventory (barcode) WHERE barcode IS NOT NULL')
 cursor.execute('''
 IF OBJECT_ID('sell_history', 'U') IS NOT NULL DROP TABLE sell_history;
 CREATE TABLE sell_history (
@@ -60,11 +66,53 @@ CREATE TABLE sell_history (
     discount_percent FLOAT NULL,
     discount_price FLOAT NULL,
     final_total FLOAT NULL,
-    timestamp NVARCHAR(50),
+    -- 'YYYY-MM-DD HH:MM:SS' text, compared and sliced exactly as in SQLite
+    timestamp NVARCHAR(19),
     customer_name NVARCHAR(100) NULL,
-    contact_number NVARCHAR(100) NULL
+    contact_number NVARCHAR(100) NULL,
+    cost_price FLOAT DEFAULT 0
 )
 ''')
+cursor.execute('CREATE INDEX idx_inventory_name ON inventory (name)')
+cursor.execute('CREATE INDEX idx_sell_history_timestamp ON sell_history (timestamp)')
+cursor.execute('CREATE INDEX idx_sell_history_name_timestamp ON sell_history (name, timestamp)')
+cursor.execute('CREATE INDEX idx_sell_history_contact_timestamp ON sell_history (contact_number, timestamp)')
+cursor.execute('CREATE INDEX idx_sell_history_customer_timestamp ON sell_history (customer_name, timestamp)')
+cursor.execute('''
+IF OBJECT_ID('daily_item_sales', 'U') IS NOT NULL DROP TABLE daily_item_sales;
+CREATE TABLE daily_item_sales (
+    day NVARCHAR(10) NOT NULL,
+    name NVARCHAR(100) NOT NULL,
+    sales INT NOT NULL DEFAULT 0,
+    quantity FLOAT NOT NULL DEFAULT 0,
+    total_sale FLOAT NOT NULL DEFAULT 0,
+    discount FLOAT NOT NULL DEFAULT 0,
+    revenue FLOAT NOT NULL DEFAULT 0,
+    cost FLOAT NOT NULL DEFAULT 0,
+    profit FLOAT NOT NULL DEFAULT 0,
+    loss FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, name)
+)
+''')
+cursor.execute('''
+IF OBJECT_ID('daily_customer_sales', 'U') IS NOT NULL DROP TABLE daily_customer_sales;
+CREATE TABLE daily_customer_sales (
+    day NVARCHAR(10) NOT NULL,
+    customer_name NVARCHAR(100) NOT NULL,
+    contact_number NVARCHAR(100) NOT NULL,
+    sales INT NOT NULL DEFAULT 0,
+    total_sale FLOAT NOT NULL DEFAULT 0,
+    discount FLOAT NOT NULL DEFAULT 0,
+    revenue FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, customer_name, contact_number)
+)
+''')
+# The app checks this against its migrations instead of running them (they are SQLite DDL)
+cursor.execute('''
+IF OBJECT_ID('schema_version', 'U') IS NOT NULL DROP TABLE schema_version;
+CREATE TABLE schema_version (version INT NOT NULL)
+''')
+cursor.execute('INSERT INTO schema_version (version) VALUES (?)', len(MIGRATIONS))
 conn.commit()
 
 # Insert default users if not present
@@ -72,11 +120,11 @@ try:
     cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'admin'")
     result = cursor.fetchone()
     if result and result[0] == 0:
-        cursor.execute('INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)', 1, 'admin', 'admin123', 'admin')
+        cursor.execute('INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)', 1, 'admin', hash_password('admin123'), 'admin')
     cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'user'")
     result = cursor.fetchone()
     if result and result[0] == 0:
-        cursor.execute('INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)', 2, 'user', 'user123', 'user')
+        cursor.execute('INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)', 2, 'user', hash_password('user123'), 'user')
     conn.commit()
     print('Default users ensured in database.')
 except Exception as e:
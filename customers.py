@@ -0,0 +1,36 @@
+from collections import OrderedDict
+
+from repository import get_customer_name_by_contact
+
+# Contact numbers kept in memory; the least recently used are evicted first
+CUSTOMER_CACHE_SIZE = 4096
+
+class CustomerDirectory:
+    # Contact number -> latest customer name, so autofill does not query per keystroke
+    def __init__(self, capacity=CUSTOMER_CACHE_SIZE):
+        self.capacity = capacity
+        self.names = OrderedDict()
+
+    def name_for(self, contact_number):
+        if contact_number in self.names:
+            self.names.move_to_end(contact_number)
+            return self.names[contact_number]
+        # Unknown contacts are not cached: another till may sell to them at any time, and a
+        # lookup is one indexed query made only when a full contact number is entered
+        name = get_customer_name_by_contact(contact_number)
+        if name:
+            self.remember(contact_number, name)
+        return name
+
+    def remember(self, contact_number, customer_name):
+        self.names[contact_number] = customer_name
+        self.names.move_to_end(contact_number)
+        if len(self.names) > self.capacity:
+            self.names.popitem(last=False)
+
+    def forget(self, *contact_numbers):
+        for contact_number in contact_numbers:
+            self.names.pop(contact_number, None)
+
+    def clear(self):
+        self.names.clear()
@@ -0,0 +1,136 @@
+import contextlib
+import functools
+import os
+import random
+import threading
+import time
+
+import changes
+from backends import SQLiteBackend
+
+CONFIG_DIR = 'config'
+LOCALDB_FILE = os.path.join(CONFIG_DIR, 'localdb.sqlite')
+
+_local = threading.local()
+_connections_lock = threading.Lock()
+_connections = []
+_generation = 0
+# PRAGMA name -> value run on every new SQLite connection, set through configure()
+_pragmas = {}
+# Set through use_backend(); None means the local SQLite file with _pragmas
+_backend = None
+# Runs of a write transaction that keeps finding the database locked, and the wait before the first rerun
+BUSY_ATTEMPTS = 5
+BUSY_BACKOFF_SECONDS = 0.05
+
+def backend():
+    global _backend
+    if _backend is None:
+        _backend = SQLiteBackend(LOCALDB_FILE, _pragmas)
+    return _backend
+
+def get_connection():
+    # One long-lived connection per thread; opened lazily on first use
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'generation', None) != _generation:
+        current = backend()
+        conn = current.connect()
+        _local.conn = conn
+        _local.owner = current
+        _local.generation = _generation
+        with _connections_lock:
+            _connections.append((current, conn))
+    return conn
+
+def release_connection():
+    # Hands this thread's connection back to a pooled backend, e.g. when a background job ends;
+    # a local SQLite connection stays open for the thread's next use
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'generation', None) != _generation or not _local.owner.pooled:
+        return
+    with _connections_lock:
+        _connections.remove((_local.owner, conn))
+    _local.conn = None
+    _local.owner.release(conn)
+
+@contextlib.contextmanager
+def transaction(immediate=False):
+    # immediate takes the write lock up front instead of at the first write.
+    # Changes noted inside are published once the commit succeeds, and dropped on rollback.
+    conn = get_connection()
+    current = backend()
+    current.begin(conn, immediate)
+    _local.changes = {}
+    try:
+        try:
+            yield conn
+            current.commit(conn)
+        except BaseException:
+            # Also after a failed COMMIT, e.g. SQLITE_BUSY in rollback-journal mode, which leaves
+            # the transaction open and its write lock held
+            current.rollback(conn)
+            raise
+        changed = _local.changes
+    finally:
+        _local.changes = None
+    committed = getattr(_local, 'committed', None)
+    if committed is None:
+        changes.publish(changed)
+    else:
+        # Inside retry_busy: published by it once the call is over
+        committed.append(changed)
+
+def retry_busy(fn):
+    # Reruns fn when another writer held the lock past the busy timeout, as long as none of its
+    # transactions has committed yet; rerunning after a commit would write it twice. Waits double
+    # each time, with jitter so tills that collided do not retry in step. Changes are published
+    # once fn is done, so a subscriber's error can never look like a failed write.
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        if getattr(_local, 'committed', None) is not None:
+            # Called from another retried function, which retries and publishes for both
+            return fn(*args, **kwargs)
+        try:
+            for attempt in range(1, BUSY_ATTEMPTS + 1):
+                _local.committed = []
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    if _local.committed or attempt == BUSY_ATTEMPTS or not backend().is_busy(e):
+                        raise
+                time.sleep(BUSY_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        finally:
+            committed, _local.committed = _local.committed, None
+            for changed in committed:
+                changes.publish(changed)
+    return run
+
+def notify_change(table, ids=None):
+    # Rows of table written by the caller; ids None when which rows is not known
+    pending = getattr(_local, 'changes', None)
+    if pending is None:
+        changes.publish(changes.merge({}, table, ids))
+    else:
+        changes.merge(pending, table, ids)
+
+def close_all():
+    # Every thread's connection is closed, or handed back to its pool; threads reconnect on next use
+    global _generation
+    with _connections_lock:
+        for owner, conn in _connections:
+            owner.release(conn)
+        _connections.clear()
+        _generation += 1
+
+def configure(pragmas):
+    # Back to the local SQLite file with these PRAGMAs; every thread reopens with the new settings
+    global _pragmas
+    _pragmas = dict(pragmas)
+    use_backend(None)
+
+def use_backend(new_backend):
+    global _backend
+    close_all()
+    if _backend is not None:
+        _backend.close()
+    _backend = new_backend
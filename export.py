@@ -0,0 +1,76 @@
+import csv
+import os
+
+from repository import SELL_HISTORY_COLUMNS, count_rows, fetch_page, sell_history_filter
+
+# Rows read from SQLite and handed to the writer at a time
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_HEADERS = [column.strip() for column in SELL_HISTORY_COLUMNS.split(',')]
+EXPORT_FORMATS = {'Excel': '.xlsx', 'CSV': '.csv', 'Parquet': '.parquet'}
+
+def iter_sell_history_chunks(where='', params=(), chunk_rows=EXPORT_CHUNK_ROWS):
+    # Keyset paging on id keeps every chunk an index seek, however deep into the table
+    after_id = None
+    while True:
+        rows = fetch_page('sell_history', SELL_HISTORY_COLUMNS, after_id, chunk_rows, where, params)
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def write_csv(file_name, chunks, job):
+    with open(file_name, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_HEADERS)
+        for rows in chunks:
+            writer.writerows(rows)
+            yield len(rows)
+
+def write_xlsx(file_name, chunks, job):
+    from openpyxl import Workbook
+    # Write-only mode streams rows to disk instead of building the sheet in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sell History')
+    sheet.append(EXPORT_HEADERS)
+    for rows in chunks:
+        for row in rows:
+            sheet.append(row)
+        yield len(rows)
+    job.check()
+    workbook.save(file_name)
+
+def write_parquet(file_name, chunks, job):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([
+        ('id', pa.int64()), ('name', pa.string()), ('quantity_sold', pa.int64()), ('price', pa.float64()),
+        ('total_sale', pa.float64()), ('discount', pa.float64()), ('discount_percent', pa.float64()),
+        ('discount_price', pa.float64()), ('final_total', pa.float64()), ('timestamp', pa.string()),
+        ('customer_name', pa.string()), ('contact_number', pa.string()), ('cost_price', pa.float64())
+    ])
+    # Each chunk becomes one row group
+    with pq.ParquetWriter(file_name, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays([pa.array(column, type=field.type)
+                                                     for column, field in zip(columns, schema)], schema=schema))
+            yield len(rows)
+
+WRITERS = {'.csv': write_csv, '.xlsx': write_xlsx, '.parquet': write_parquet}
+
+def export_sell_history(job, file_name, date_from=None, date_to=None, customer_name=None, contact_number=None, item_name=None):
+    # Background job; the writer is picked from the file extension. Returns the number of rows written.
+    where, params = sell_history_filter(date_from, date_to, customer_name, contact_number, item_name)
+    total = count_rows('sell_history', where, params)
+    writer = WRITERS[file_name[file_name.rindex('.'):].lower()]
+    written = 0
+    try:
+        for count in writer(file_name, iter_sell_history_chunks(where, params), job):
+            written += count
+            job.progress(written, total)
+    except BaseException:
+        # Cancelled or failed: do not leave a truncated file behind
+        if os.path.exists(file_name):
+            os.remove(file_name)
+        raise
+    return written
@@ -0,0 +1,52 @@
+from collections import defaultdict
+
+class InventoryIndex:
+    # Inventory rows by id in load order, with name and barcode lookups kept in step.
+    # Names and barcodes need not be unique; lookups return the earliest row holding them.
+    def __init__(self, items=()):
+        self.by_id = {}
+        self.names = defaultdict(dict)
+        self.barcodes = defaultdict(dict)
+        for item in items:
+            self.put(item)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+    def put(self, item):
+        # A changed row keeps its position; a new one goes to the end
+        old = self.by_id.get(item.id)
+        if old is not None:
+            self._unlink(old)
+        self.by_id[item.id] = item
+        self.names[item.name][item.id] = True
+        if item.barcode:
+            self.barcodes[item.barcode][item.id] = True
+
+    def remove(self, item_id):
+        item = self.by_id.pop(item_id, None)
+        if item is not None:
+            self._unlink(item)
+
+    def _unlink(self, item):
+        for lookup, key in ((self.names, item.name), (self.barcodes, item.barcode)):
+            ids = lookup.get(key)
+            if ids is not None:
+                ids.pop(item.id, None)
+                if not ids:
+                    del lookup[key]
+
+    def find_by_name(self, name):
+        return self._first(self.names.get(name))
+
+    def find_by_barcode(self, barcode):
+        return self._first(self.barcodes.get(barcode))
+
+    def _first(self, ids):
+        return self.by_id[next(iter(ids))] if ids else None
@@ -1,22 +1,50 @@
+import startup
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from tkinter import filedialog, messagebox, simpledialog
 from tkinter import ttk
-import json
 import os
 import datetime
 import re
 import calendar
-import pandas as pd
 import sqlite3
 import sys
+import threading
+import changes
+import db
+from checkout import CheckoutError, cart_line, checkout
+from customers import CustomerDirectory
+from export import EXPORT_FORMATS, export_sell_history
+from migrations import migrate
+from profit import GROUPINGS, SALE_PROFIT_COLUMNS, profit_by, profit_totals
+from rollups import customer_period_totals, dashboard, period_totals
+from stock_import import IMPORT_FORMATS, InvalidImportFile, import_inventory, write_rejects
+import pdf_reports
+from inventory_index import InventoryIndex
+from search import InventorySearch
+from storage import configure_storage
+from worker import BackgroundWorker, show_error
+from virtual_table import KeysetSource, SellHistorySource, VirtualTable
+from db import CONFIG_DIR
+from repository import (
+    load_users, load_inventory, load_inventory_items, add_inventory_item, update_inventory_item, delete_inventory_item,
+    find_item_by_barcode, iter_sell_history, load_sell_history, rename_customer, sell_history_filter,
+    delete_user, DuplicateUsername, StaleItem
+)
+from users import authenticate, change_user, create_user
+startup.mark('imports')
 
-# Ensure config folder and users.json exist
-CONFIG_DIR = 'config'
-USERS_FILE = os.path.join(CONFIG_DIR, 'users.json')
+# Seeded into a new database; migrations replace the passwords with hashes
 DEFAULT_USERS = [
     {'id': 1, 'username': 'admin', 'password': 'admin123', 'role': 'admin'},
     {'id': 2, 'username': 'user', 'password': 'user123', 'role': 'user'}
 ]
+REPORTLAB_MISSING = 'reportlab is required to save PDF. Please install it with:\npip install reportlab'
+# Delay between the last keystroke in the search box and the search itself
+SEARCH_DEBOUNCE_MS = 150
+# A change to more inventory rows than this reloads the whole inventory in the background instead
+FULL_RELOAD_ROWS = 500
+# Sell history sort orders offered in the history and sales report dialogs
+HISTORY_SORTS = {'Newest first': 'newest', 'Oldest first': 'oldest'}
 if getattr(sys, 'frozen', False):
     # Running as a bundled exe
     os.chdir(os.path.dirname(sys.executable))
@@ -26,30 +54,16 @@ else:
 
 if not os.path.exists(CONFIG_DIR):
     os.makedirs(CONFIG_DIR)
-if not os.path.exists(USERS_FILE):
-    with open(USERS_FILE, 'w') as f:
-        json.dump(DEFAULT_USERS, f, indent=2)
 
 INVENTORY_FILE = os.path.join(CONFIG_DIR, 'inventory.json')
-SELL_HISTORY_FILE = os.path.join(CONFIG_DIR, 'sell_history.json')
-LOCALDB_FILE = os.path.join(CONFIG_DIR, 'localdb.sqlite')
-
-# --- MIGRATION: Ensure cost_price column exists in sell_history before any DB access ---
-if os.path.exists(LOCALDB_FILE):
-    conn = sqlite3.connect(LOCALDB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(sell_history)")
-    columns = [row[1] for row in cursor.fetchall()]
-    if 'cost_price' not in columns:
-        cursor.execute("ALTER TABLE sell_history ADD COLUMN cost_price REAL DEFAULT 0")
-        conn.commit()
-    conn.close()
 
 def initialize_database():
     if not os.path.exists(CONFIG_DIR):
         os.makedirs(CONFIG_DIR)
-    if not os.path.exists(LOCALDB_FILE):
-        conn = sqlite3.connect(LOCALDB_FILE)
+    current = db.backend()
+    # A server database is provisioned by create_sqlserver_db.py instead
+    if current.name == 'sqlite' and not os.path.exists(current.file_name):
+        conn = sqlite3.connect(current.file_name)
         cursor = conn.cursor()
         # Create users table
         cursor.execute('''
@@ -97,96 +111,7 @@ def initialize_database():
         ''')
         conn.commit()
         conn.close()
-
-def load_users():
-    if not os.path.exists(LOCALDB_FILE):
-        return []
-    conn = sqlite3.connect(LOCALDB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, username, password, role FROM users')
-    users = [
-        {'id': row[0], 'username': row[1], 'password': row[2], 'role': row[3]}
-        for row in cursor.fetchall()
-    ]
-    conn.close()
-    return users
-
-def save_users(users):
-    # This function should be refactored to update the SQLite DB if needed
-    pass
-
-def get_next_user_id(users):
-    if not users:
-        return 1
-    return max(u['id'] for u in users) + 1
-
-def find_user_by_username(users, username):
-    for u in users:
-        if u['username'] == username:
-            return u
-    return None
-
-def find_user_by_id(users, user_id):
-    for u in users:
-        if u['id'] == user_id:
-            return u
-    return None
-
-def load_inventory():
-    if not os.path.exists(LOCALDB_FILE):
-        return []
-    conn = sqlite3.connect(LOCALDB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, name, quantity, price, barcode, cost_price FROM inventory')
-    inventory = [
-        {'id': row[0], 'name': row[1], 'quantity': row[2], 'price': row[3], 'barcode': row[4], 'cost_price': row[5]}
-        for row in cursor.fetchall()
-    ]
-    conn.close()
-    return inventory
-
-def save_inventory(inventory):
-    # This function should be refactored to update the SQLite DB if needed
-    pass
-
-def load_sell_history():
-    if not os.path.exists(LOCALDB_FILE):
-        return []
-    conn = sqlite3.connect(LOCALDB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''SELECT id, name, quantity_sold, price, total_sale, discount, discount_percent, discount_price, final_total, timestamp, customer_name, contact_number, cost_price FROM sell_history''')
-    history = [
-        {
-            'id': row[0],
-            'name': row[1],
-            'quantity_sold': row[2],
-            'price': row[3],
-            'total_sale': row[4],
-            'discount': row[5],
-            'discount_percent': row[6],
-            'discount_price': row[7],
-            'final_total': row[8],
-            'timestamp': row[9],
-            'customer_name': row[10],
-            'contact_number': row[11],
-            'cost_price': row[12]
-        }
-        for row in cursor.fetchall()
-    ]
-    conn.close()
-    return history
-
-def save_sell_history(history):
-    with open(SELL_HISTORY_FILE, 'w') as f:
-        json.dump(history, f, indent=2)
-
-def get_customer_name_by_contact(contact_number):
-    history = load_sell_history()
-    # Find the most recent entry for this contact number
-    for entry in reversed(history):
-        if isinstance(entry, dict) and entry.get('contact_number', '') == contact_number:
-            return entry.get('customer_name', '')
-    return ''
+    migrate()
 
 class InventoryApp:
     def __init__(self, root):
@@ -204,9 +129,20 @@ class InventoryApp:
         style.configure('Inventory.TLabel', background='#ffffff', font=('Segoe UI', 12))
         style.configure('Inventory.TButton', font=('Segoe UI', 12), padding=6)
         self.role = None
-        self.inventory = load_inventory()
-        self.users = load_users()
+        # Data loads after the login screen is up; inventory through the usual background reload
+        self.inventory = InventoryIndex()
+        self.search = InventorySearch()
+        # Ids written while a full background reload is running, else None
+        self.pending_changes = None
+        # Set when another full reload was asked for while one was running
+        self.reload_again = False
+        self.customers = CustomerDirectory()
+        self.worker = BackgroundWorker(self.root)
+        # (tables, callback) of open dialogs that follow data changes
+        self.change_watchers = []
+        changes.subscribe(self.on_data_changed)
         self.login_screen()
+        self.refresh_list()
 
     def login_screen(self):
         self.clear()
@@ -221,20 +157,27 @@ class InventoryApp:
         ttk.Label(frame, text='Password:', style='Inventory.TLabel').grid(row=2, column=0, sticky='e', pady=5, padx=5)
         self.password_entry = ttk.Entry(frame, show='*', width=20, style='TEntry')
         self.password_entry.grid(row=2, column=1, pady=5, padx=5)
-        login_btn = ttk.Button(frame, text='Login', command=self.authenticate, style='Inventory.TButton')
-        login_btn.grid(row=3, column=0, columnspan=2, pady=(20, 10))
+        self.login_btn = ttk.Button(frame, text='Login', command=self.authenticate, style='Inventory.TButton')
+        self.login_btn.grid(row=3, column=0, columnspan=2, pady=(20, 10))
         self.username_entry.focus()
 
     def authenticate(self):
         username = self.username_entry.get()
         password = self.password_entry.get()
-        user = find_user_by_username(self.users, username)
-        if user and user['password'] == password:
-            self.role = user['role']
-            self.current_user_id = user['id']
+        # The password hash is deliberately slow, so it is checked off the Tk thread
+        self.login_btn.state(['disabled'])
+        def logged_in(user):
+            if user is None:
+                self.login_btn.state(['!disabled'])
+                messagebox.showerror('Error', 'Invalid credentials!')
+                return
+            self.role = user.role
+            self.current_user_id = user.id
             self.main_screen()
-        else:
-            messagebox.showerror('Error', 'Invalid credentials!')
+        def failed(error):
+            self.login_btn.state(['!disabled'])
+            show_error(error)
+        self.worker.submit(lambda job: authenticate(username, password), on_done=logged_in, on_error=failed)
 
     def main_screen(self):
         self.clear()
@@ -249,6 +192,7 @@ class InventoryApp:
             file_menu.add_command(label='Add Item', command=self.add_item)
             file_menu.add_command(label='Edit Item', command=self.edit_item)
             file_menu.add_command(label='Delete Item', command=self.delete_item)
+            file_menu.add_command(label='Import Stock', command=self.import_stock)
         file_menu.add_separator()
         file_menu.add_command(label='Exit', command=self.root.quit)
         self.menu.add_cascade(label='File', menu=file_menu)
@@ -258,6 +202,8 @@ class InventoryApp:
         inventory_menu.add_command(label='Sell Item', command=self.sell_item)
         inventory_menu.add_command(label='Sell History', command=self.view_history)
         inventory_menu.add_command(label='Profit/Loss Report', command=self.profit_loss_report)
+        inventory_menu.add_command(label='Sales Dashboard', command=self.sales_dashboard)
+        inventory_menu.add_command(label='Reprint Bills for a Day', command=self.reprint_bills)
         self.menu.add_cascade(label='Inventory', menu=inventory_menu)
         # Users menu (admin only)
         if self.role == 'admin':
@@ -290,6 +236,8 @@ class InventoryApp:
         table_frame.pack(pady=10, padx=10, fill='both', expand=True)
         columns = ('ID', 'Name', 'Quantity', 'Price', 'Total Price', 'Cost Price')
         self.tree = ttk.Treeview(table_frame, columns=columns, show='headings', height=12)
+        # Values currently shown in the tree, keyed by inventory id (also the row iid)
+        self.tree_rows = {}
         self.tree.heading('ID', text='ID')
         self.tree.heading('Name', text='Name')
         self.tree.heading('Quantity', text='Quantity')
@@ -317,32 +265,150 @@ class InventoryApp:
         creator_label.pack(side='bottom', pady=2)
 
     def on_search(self, event=None):
-        query = self.search_var.get().strip().lower()
-        if not query:
+        if getattr(self, 'search_job', None):
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        self.search_job = None
+        matched_ids = self.search.search(self.search_var.get())
+        if matched_ids is None:
             filtered = self.inventory
         else:
-            filtered = [item for item in self.inventory if query in item['name'].lower()]
+            filtered = [self.inventory.get(item_id) for item_id in matched_ids]
         if hasattr(self, 'tree'):
-            for row in self.tree.get_children():
-                self.tree.delete(row)
-            for idx, item in enumerate(filtered, 1):
-                total_price = item['quantity'] * item['price']
-                self.tree.insert('', 'end', values=(idx, item['name'], item['quantity'], item['price'], total_price, item.get('cost_price', 0)))
+            self.render_rows(filtered)
         self.update_grand_total()
 
-    def refresh_list(self):
-        self.inventory = load_inventory()
-        if hasattr(self, 'tree'):
-            for row in self.tree.get_children():
-                self.tree.delete(row)
-            for idx, item in enumerate(self.inventory, 1):
-                total_price = item['quantity'] * item['price']
-                self.tree.insert('', 'end', values=(idx, item['name'], item['quantity'], item['price'], total_price, item.get('cost_price', 0)))
+    def refresh_list(self, changed_ids=None):
+        # With changed_ids only those inventory rows are reloaded and redrawn;
+        # a full reload and re-index runs in the background
+        if changed_ids is None:
+            if self.pending_changes is None:
+                self.pending_changes = set()
+                self.worker.submit(self.load_full_inventory, on_done=self.finish_full_refresh)
+            else:
+                # The running load may have read the inventory before this change; load again after it
+                self.reload_again = True
+            return
+        changed_ids = set(changed_ids)
+        if self.pending_changes is not None:
+            # The full load may have read these rows before they were written
+            self.pending_changes |= changed_ids
+        self.apply_inventory_changes(changed_ids)
+        self.update_grand_total()
+
+    def load_full_inventory(self, job):
+        inventory = InventoryIndex(load_inventory())
+        job.check()
+        return inventory, InventorySearch(inventory)
+
+    def finish_full_refresh(self, result):
+        self.inventory, self.search = result
+        startup.mark('inventory_loaded')
+        pending, self.pending_changes = self.pending_changes, None
+        if hasattr(self, 'tree') and self.tree.winfo_exists():
+            self.render_rows([item for item in self.inventory if self.matches_search(item)])
+        if pending:
+            self.apply_inventory_changes(pending)
         self.update_grand_total()
+        self.notify_watchers({'inventory': None})
+        if self.reload_again:
+            self.reload_again = False
+            self.refresh_list()
+
+    def on_data_changed(self, changed):
+        # Runs on whichever thread committed; the Tk thread applies its own writes straight away
+        if threading.current_thread() is threading.main_thread():
+            self.apply_data_changes(changed)
+        else:
+            self.worker.post(self.apply_data_changes, changed)
+
+    def apply_data_changes(self, changed):
+        item_ids = changed.get('inventory', ())
+        if item_ids is None or len(item_ids) > FULL_RELOAD_ROWS:
+            # Inventory watchers hear of it once the background reload has finished
+            self.refresh_list()
+            changed = {table: ids for table, ids in changed.items() if table != 'inventory'}
+        elif item_ids:
+            self.refresh_list(item_ids)
+        if 'sell_history' in changed and changed['sell_history'] is None:
+            # Sales or renames made elsewhere: any cached name, or cached unknown contact, may be stale
+            self.customers.clear()
+        self.notify_watchers(changed)
+
+    def notify_watchers(self, changed):
+        for tables, callback in list(self.change_watchers):
+            if any(table in changed for table in tables):
+                callback()
+
+    def watch_changes(self, dialog, tables, callback):
+        # callback() runs on the Tk thread after a commit touches any of tables, until dialog closes
+        watcher = (tables, callback)
+        self.change_watchers.append(watcher)
+        def closed(event):
+            if event.widget is dialog and watcher in self.change_watchers:
+                self.change_watchers.remove(watcher)
+        dialog.bind('<Destroy>', closed, add='+')
+
+    def apply_inventory_changes(self, changed_ids):
+        changed = {item.id: item for item in load_inventory_items(changed_ids)}
+        for item_id in changed_ids:
+            if item_id in changed:
+                self.inventory.put(changed[item_id])
+                self.search.add(changed[item_id])
+            else:
+                self.inventory.remove(item_id)
+                self.search.remove(item_id)
+        # After Logout the tree is destroyed, but a background write may still land
+        if not hasattr(self, 'tree') or not self.tree.winfo_exists():
+            return
+        for item_id in changed_ids:
+            if item_id in changed:
+                self.render_row(changed[item_id])
+            elif item_id in self.tree_rows:
+                self.tree.delete(item_id)
+                del self.tree_rows[item_id]
+
+    def render_row(self, item):
+        item_id = item.id
+        if not self.matches_search(item):
+            if item_id in self.tree_rows:
+                self.tree.delete(item_id)
+                del self.tree_rows[item_id]
+            return
+        values = self.inventory_row_values(item)
+        if item_id not in self.tree_rows:
+            self.tree.insert('', 'end', iid=item_id, values=values)
+        elif self.tree_rows[item_id] != values:
+            self.tree.item(item_id, values=values)
+        self.tree_rows[item_id] = values
+
+    def render_rows(self, items):
+        # Bring the tree in line with items, touching only the rows that differ
+        wanted = {item.id: self.inventory_row_values(item) for item in items}
+        stale = [item_id for item_id in self.tree_rows if item_id not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+        for position, (item_id, values) in enumerate(wanted.items()):
+            current = self.tree_rows.get(item_id)
+            if current is None:
+                self.tree.insert('', position, iid=item_id, values=values)
+            elif current != values:
+                self.tree.item(item_id, values=values)
+        self.tree_rows = wanted
+
+    def inventory_row_values(self, item):
+        total_price = item.quantity * item.price
+        return (item.id, item.name, item.quantity, item.price, total_price, item.cost_price or 0)
+
+    def matches_search(self, item):
+        query = self.search_var.get().strip().lower() if hasattr(self, 'search_var') else ''
+        return self.search.matches(item, query)
 
     def update_grand_total(self):
         if hasattr(self, 'inventory'):
-            grand_total = sum(item['quantity'] * item['price'] for item in self.inventory)
+            grand_total = sum(item.quantity * item.price for item in self.inventory)
             if hasattr(self, 'grand_total_var'):
                 self.grand_total_var.set(f'Grand Total: {grand_total}')
 
@@ -362,6 +428,9 @@ class InventoryApp:
         ttk.Label(dialog, text='Cost Price:', style='Inventory.TLabel').grid(row=3, column=0, pady=8, padx=8, sticky='e')
         cost_price_entry = ttk.Entry(dialog, width=25, style='TEntry')
         cost_price_entry.grid(row=3, column=1, pady=8, padx=8)
+        ttk.Label(dialog, text='Barcode:', style='Inventory.TLabel').grid(row=4, column=0, pady=8, padx=8, sticky='e')
+        barcode_entry = ttk.Entry(dialog, width=25, style='TEntry')
+        barcode_entry.grid(row=4, column=1, pady=8, padx=8)
         def submit():
             name = name_entry.get()
             try:
@@ -374,19 +443,44 @@ class InventoryApp:
             if not name:
                 messagebox.showerror('Error', 'Name cannot be empty!')
                 return
-            conn = sqlite3.connect(LOCALDB_FILE)
-            cursor = conn.cursor()
-            cursor.execute('INSERT INTO inventory (name, quantity, price, barcode, cost_price) VALUES (?, ?, ?, ?, ?)',
-                           (name, quantity, price, '', cost_price))
-            conn.commit()
-            conn.close()
-            self.refresh_list()
-            messagebox.showinfo('Success', 'Item added!')
-            dialog.destroy()
-        ttk.Button(dialog, text='Add', command=submit, style='Inventory.TButton').grid(row=4, column=0, columnspan=2, pady=12)
+            def added(item_id):
+                messagebox.showinfo('Success', 'Item added!')
+                dialog.destroy()
+            # A DuplicateBarcode is shown by the default error handler
+            self.run_write(add_btn, add_inventory_item, name, quantity, price, cost_price, barcode_entry.get(), on_done=added)
+        add_btn = ttk.Button(dialog, text='Add', command=submit, style='Inventory.TButton')
+        add_btn.grid(row=5, column=0, columnspan=2, pady=12)
         dialog.grab_set()
         name_entry.focus()
 
+    def import_stock(self):
+        file_name = filedialog.askopenfilename(
+            parent=self.root, title='Import Stock',
+            filetypes=[(label, f'*{extension}') for label, extension in IMPORT_FORMATS.items()])
+        if not file_name:
+            return
+        add_quantity = messagebox.askyesno(
+            'Import Stock', 'Add the quantities in the file to current stock?\n\nChoose No to replace stock levels instead.')
+        def done(result):
+            message = f'{result.inserted} item(s) added, {result.updated} item(s) updated.'
+            if result.rejected:
+                reports_folder = 'reports'
+                if not os.path.exists(reports_folder):
+                    os.makedirs(reports_folder)
+                now_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+                rejects_file = write_rejects(os.path.join(reports_folder, f'import_rejects_{now_str}.csv'), result.rejected)
+                shown = '\n'.join(f'Line {line}: {reason}' for line, reason in result.rejected[:10])
+                message += f'\n\n{len(result.rejected)} row(s) rejected, listed in {rejects_file}:\n{shown}'
+            messagebox.showinfo('Import Complete', message)
+        def failed(e):
+            if isinstance(e, ImportError):
+                messagebox.showerror('Missing Library', f'{e.name} is required for this format. Please install it with:\npip install {e.name}')
+            elif isinstance(e, InvalidImportFile):
+                messagebox.showerror('Error', str(e))
+            else:
+                messagebox.showerror('Error', f'Failed to import: {e}')
+        self.run_job('Importing stock', import_inventory, file_name, add_quantity=add_quantity, on_done=done, on_error=failed)
+
     def edit_item(self):
         if not hasattr(self, 'tree'):
             return
@@ -394,28 +488,33 @@ class InventoryApp:
         if not selection:
             messagebox.showerror('Error', 'No item selected!')
             return
-        item_values = self.tree.item(selection[0])['values']
-        idx = int(item_values[0]) - 1
-        item = self.inventory[idx]
+        item = self.inventory.get(int(selection[0]))
+        if item is None:
+            messagebox.showerror('Error', 'Item not found!')
+            return
         dialog = tk.Toplevel(self.root)
         dialog.title('Edit Item')
         dialog.configure(bg='#f0f4f8')
         ttk.Label(dialog, text='Item name:', style='Inventory.TLabel').grid(row=0, column=0, pady=8, padx=8, sticky='e')
         name_entry = ttk.Entry(dialog, width=25, style='TEntry')
-        name_entry.insert(0, item['name'])
+        name_entry.insert(0, item.name)
         name_entry.grid(row=0, column=1, pady=8, padx=8)
         ttk.Label(dialog, text='Quantity:', style='Inventory.TLabel').grid(row=1, column=0, pady=8, padx=8, sticky='e')
         quantity_entry = ttk.Entry(dialog, width=25, style='TEntry')
-        quantity_entry.insert(0, str(item['quantity']))
+        quantity_entry.insert(0, str(item.quantity))
         quantity_entry.grid(row=1, column=1, pady=8, padx=8)
         ttk.Label(dialog, text='Price:', style='Inventory.TLabel').grid(row=2, column=0, pady=8, padx=8, sticky='e')
         price_entry = ttk.Entry(dialog, width=25, style='TEntry')
-        price_entry.insert(0, str(item['price']))
+        price_entry.insert(0, str(item.price))
         price_entry.grid(row=2, column=1, pady=8, padx=8)
         ttk.Label(dialog, text='Cost Price:', style='Inventory.TLabel').grid(row=3, column=0, pady=8, padx=8, sticky='e')
         cost_price_entry = ttk.Entry(dialog, width=25, style='TEntry')
-        cost_price_entry.insert(0, str(item.get('cost_price', 0)))
+        cost_price_entry.insert(0, str(item.cost_price or 0))
         cost_price_entry.grid(row=3, column=1, pady=8, padx=8)
+        ttk.Label(dialog, text='Barcode:', style='Inventory.TLabel').grid(row=4, column=0, pady=8, padx=8, sticky='e')
+        barcode_entry = ttk.Entry(dialog, width=25, style='TEntry')
+        barcode_entry.insert(0, item.barcode or '')
+        barcode_entry.grid(row=4, column=1, pady=8, padx=8)
         def submit():
             name = name_entry.get()
             try:
@@ -428,16 +527,21 @@ class InventoryApp:
             if not name:
                 messagebox.showerror('Error', 'Name cannot be empty!')
                 return
-            conn = sqlite3.connect(LOCALDB_FILE)
-            cursor = conn.cursor()
-            cursor.execute('UPDATE inventory SET name=?, quantity=?, price=?, cost_price=? WHERE id=?',
-                           (name, quantity, price, cost_price, item['id']))
-            conn.commit()
-            conn.close()
-            self.refresh_list()
-            messagebox.showinfo('Success', 'Item updated!')
-            dialog.destroy()
-        ttk.Button(dialog, text='Update', command=submit, style='Inventory.TButton').grid(row=4, column=0, columnspan=2, pady=12)
+            def updated(result):
+                messagebox.showinfo('Success', 'Item updated!')
+                dialog.destroy()
+            def failed(e):
+                if not isinstance(e, StaleItem):
+                    show_error(e)
+                    return
+                # Another till sold or edited it meanwhile; show its current row and let the user start again
+                messagebox.showerror('Error', f'{e}. Please check it and edit again.')
+                self.refresh_list([item.id])
+                dialog.destroy()
+            self.run_write(update_btn, update_inventory_item, item.id, name, quantity, price, cost_price, barcode_entry.get(),
+                           item.version, on_done=updated, on_error=failed)
+        update_btn = ttk.Button(dialog, text='Update', command=submit, style='Inventory.TButton')
+        update_btn.grid(row=5, column=0, columnspan=2, pady=12)
         dialog.grab_set()
         name_entry.focus()
 
@@ -448,29 +552,36 @@ class InventoryApp:
         if not selection:
             messagebox.showerror('Error', 'No item selected!')
             return
-        item_values = self.tree.item(selection[0])['values']
-        idx = int(item_values[0]) - 1
-        item = self.inventory[idx]
-        if messagebox.askyesno('Confirm', f"Delete item: {item['name']}?"):
-            self.inventory.pop(idx)
-            save_inventory(self.inventory)
-            self.refresh_list()
+        item = self.inventory.get(int(selection[0]))
+        if item is None:
+            messagebox.showerror('Error', 'Item not found!')
+            return
+        if not messagebox.askyesno('Confirm', f"Delete item: {item.name}?"):
+            return
+        def deleted(result):
             messagebox.showinfo('Success', 'Item deleted!')
+        def failed(e):
+            if not isinstance(e, StaleItem):
+                show_error(e)
+                return
+            messagebox.showerror('Error', f'{e}. Please check it before deleting.')
+            self.refresh_list([item.id])
+        # Started from the menu, so there is no button to hold; a repeat finds the row gone and is refused as stale
+        self.run_write(None, delete_inventory_item, item.id, item.version, item.name, on_done=deleted, on_error=failed)
 
     def sell_item(self):
         if not hasattr(self, 'tree'):
             return
         selection = self.tree.selection()
-        idx = None
         item = None
         if selection:
-            item_values = self.tree.item(selection[0])['values']
-            idx = int(item_values[0]) - 1
-            item = self.inventory[idx]
+            item = self.inventory.get(int(selection[0]))
         sell_dialog = tk.Toplevel(self.root)
         sell_dialog.title('Sell Item')
         sell_dialog.configure(bg='#f0f4f8')
-        ttk.Label(sell_dialog, text='Select item to sell', style='Inventory.TLabel').grid(row=0, column=0, columnspan=2, pady=10, padx=10)
+        ttk.Label(sell_dialog, text='Scan barcode:', style='Inventory.TLabel').grid(row=0, column=0, pady=10, padx=8, sticky='e')
+        scan_entry = ttk.Entry(sell_dialog, width=25, style='TEntry')
+        scan_entry.grid(row=0, column=1, pady=10, padx=8)
         ttk.Label(sell_dialog, text='Item name:', style='Inventory.TLabel').grid(row=1, column=0, pady=8, padx=8, sticky='e')
         name_entry = ttk.Entry(sell_dialog, width=25, style='TEntry')
         name_entry.grid(row=1, column=1, pady=8, padx=8)
@@ -490,7 +601,7 @@ class InventoryApp:
         def autofill_customer_name(event=None):
             contact = contact_number_entry.get().strip()
             if contact and re.fullmatch(r'\d{10}', contact):
-                name = get_customer_name_by_contact(contact)
+                name = self.customers.name_for(contact)
                 if name:
                     customer_name_entry.delete(0, tk.END)
                     customer_name_entry.insert(0, name)
@@ -501,12 +612,24 @@ class InventoryApp:
         discount_percent_entry = ttk.Entry(sell_dialog, width=25, style='TEntry')
         discount_percent_entry.insert(0, '0')
         discount_percent_entry.grid(row=6, column=1, pady=8, padx=8)
-        qty_in_stock_label = ttk.Label(sell_dialog, text=f"In stock: {item['quantity']}" if item else '', style='Inventory.TLabel')
+        qty_in_stock_label = ttk.Label(sell_dialog, text=f"In stock: {item.quantity}" if item else '', style='Inventory.TLabel')
         qty_in_stock_label.grid(row=7, column=0, columnspan=2, pady=5)
         if item:
-            name_entry.insert(0, item['name'])
-            price_entry.insert(0, str(item['price']))
-        def submit():
+            name_entry.insert(0, item.name)
+            price_entry.insert(0, str(item.price))
+        cart = []
+        cart_tree = ttk.Treeview(sell_dialog, columns=('Item', 'Qty', 'Price', 'Disc (%)', 'Final'), show='headings', height=5)
+        for col, width in (('Item', 140), ('Qty', 50), ('Price', 70), ('Disc (%)', 70), ('Final', 80)):
+            cart_tree.heading(col, text=col)
+            cart_tree.column(col, width=width, anchor='center')
+        cart_total_label = ttk.Label(sell_dialog, text='Cart Total: 0', style='Inventory.TLabel')
+        def redraw_cart():
+            cart_tree.delete(*cart_tree.get_children())
+            for line in cart:
+                cart_tree.insert('', 'end', values=(line['name'], line['quantity'], line['price'], line['discount_percent'], line['final_total']))
+            cart_total_label.config(text=f"Cart Total: {sum(line['final_total'] for line in cart)}")
+        def add_line():
+            # Prices the line in the entries; returns False after showing why it could not
             name = name_entry.get()
             try:
                 sell_qty = int(qty_entry.get())
@@ -514,133 +637,102 @@ class InventoryApp:
                 discount_percent = float(discount_percent_entry.get())
             except ValueError:
                 messagebox.showerror('Error', 'Invalid quantity or price!')
-                return
-            customer_name = customer_name_entry.get().strip()
-            contact_number = contact_number_entry.get().strip()
-            # Validation for customer name (alphabets and spaces only)
-            if not customer_name:
-                messagebox.showerror('Error', 'Customer name cannot be empty!')
-                return
-            if not re.fullmatch(r'[A-Za-z ]+', customer_name):
-                messagebox.showerror('Error', 'Customer name must contain only alphabets and spaces!')
-                return
-            # Validation for contact number (10 digits only)
-            if not contact_number:
-                messagebox.showerror('Error', 'Contact number cannot be empty!')
-                return
-            if not re.fullmatch(r'\d{10}', contact_number):
-                messagebox.showerror('Error', 'Contact number must be exactly 10 digits!')
-                return
-            # Find item by name
-            matched_item = None
-            for itm in self.inventory:
-                if itm['name'] == name:
-                    matched_item = itm
-                    break
+                return False
+            matched_item = self.inventory.find_by_name(name)
             if not matched_item:
                 messagebox.showerror('Error', 'Item not found!')
+                return False
+            try:
+                cart.append(cart_line(matched_item, sell_qty, price, discount_percent))
+            except CheckoutError as e:
+                messagebox.showerror('Error', str(e))
+                return False
+            for entry in (name_entry, qty_entry, price_entry):
+                entry.delete(0, tk.END)
+            qty_in_stock_label.config(text='')
+            redraw_cart()
+            name_entry.focus()
+            return True
+        def scan_barcode(event=None):
+            # A scanner types the code and presses Enter; each scan adds one unit at the item's price
+            barcode = scan_entry.get().strip()
+            scan_entry.delete(0, tk.END)
+            if not barcode:
+                return 'break'
+            matched_item = self.inventory.find_by_barcode(barcode)
+            if matched_item is None:
+                matched_item = find_item_by_barcode(barcode)
+                if matched_item is None:
+                    sell_dialog.bell()
+                    qty_in_stock_label.config(text=f'Unknown barcode: {barcode}')
+                    return 'break'
+                # Added by another till since the list loaded; checkout looks items up in self.inventory
+                self.refresh_list([matched_item.id])
+            try:
+                discount_percent = float(discount_percent_entry.get() or 0)
+            except ValueError:
+                discount_percent = 0
+            for position, line in enumerate(cart):
+                if (line['item_id'], line['price'], line['discount_percent']) == (matched_item.id, matched_item.price, discount_percent):
+                    cart[position] = cart_line(matched_item, line['quantity'] + 1, line['price'], discount_percent)
+                    break
+            else:
+                try:
+                    cart.append(cart_line(matched_item, 1, matched_item.price, discount_percent))
+                except CheckoutError as e:
+                    messagebox.showerror('Error', str(e))
+                    return 'break'
+            qty_in_stock_label.config(text=f'{matched_item.name} - in stock: {matched_item.quantity}')
+            redraw_cart()
+            return 'break'
+        scan_entry.bind('<Return>', scan_barcode)
+        scan_entry.bind('<KP_Enter>', scan_barcode)
+        def remove_line():
+            selection = cart_tree.selection()
+            if selection:
+                del cart[cart_tree.index(selection[0])]
+                redraw_cart()
+        def submit():
+            # Whatever is still typed in the entries is sold as the last line
+            if name_entry.get().strip() and not add_line():
                 return
-            if sell_qty <= 0:
-                messagebox.showerror('Error', 'Quantity must be positive!')
-                return
-            if sell_qty > matched_item['quantity']:
-                messagebox.showerror('Error', 'Not enough in stock!')
-                return
-            matched_item['quantity'] -= sell_qty
-            # Update inventory in DB
-            conn = sqlite3.connect(LOCALDB_FILE)
-            cursor = conn.cursor()
-            cursor.execute('UPDATE inventory SET quantity = ? WHERE id = ?', (matched_item['quantity'], matched_item['id']))
-            conn.commit()
-            # Save to sell history in DB
-            total_sale = sell_qty * price
-            if discount_percent < 0 or discount_percent > 100:
-                messagebox.showerror('Error', 'Discount percent must be between 0 and 100!')
-                conn.close()
-                return
-            discount = (discount_percent / 100.0) * total_sale
-            final_total = total_sale - discount
-            now_str = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute('''INSERT INTO sell_history (
-                name, quantity_sold, price, total_sale, discount_percent, discount_price, final_total, timestamp, customer_name, contact_number, cost_price
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                (matched_item['name'], sell_qty, price, total_sale, discount_percent, discount, final_total, now_str, customer_name, contact_number, matched_item.get('cost_price', 0)))
-            conn.commit()
-            conn.close()
-            self.refresh_list()
-            sell_dialog.destroy()
-            self.show_bill(matched_item['name'], sell_qty, price, total_sale, discount_percent, discount, final_total, now_str, customer_name, contact_number)
-        ttk.Button(sell_dialog, text='Sell', command=submit, style='Inventory.TButton').grid(row=8, column=0, columnspan=2, pady=12)
+            customer_name = customer_name_entry.get().strip()
+            contact_number = contact_number_entry.get().strip()
+            lines = list(cart)
+            def sold(now_str):
+                self.customers.remember(contact_number, customer_name)
+                sell_dialog.destroy()
+                self.show_bill(lines, now_str, customer_name, contact_number)
+            # A CheckoutError is shown by the default error handler, with the cart left as it was
+            self.run_write(sell_btn, checkout, lines, self.inventory, customer_name, contact_number, on_done=sold)
+        cart_btn_frame = ttk.Frame(sell_dialog)
+        cart_btn_frame.grid(row=8, column=0, columnspan=2, pady=5)
+        ttk.Button(cart_btn_frame, text='Add to Cart', command=add_line, style='Inventory.TButton').pack(side='left', padx=5)
+        ttk.Button(cart_btn_frame, text='Remove Line', command=remove_line, style='Inventory.TButton').pack(side='left', padx=5)
+        cart_tree.grid(row=9, column=0, columnspan=2, padx=10, pady=5)
+        cart_total_label.grid(row=10, column=0, columnspan=2, pady=5)
+        sell_btn = ttk.Button(sell_dialog, text='Sell', command=submit, style='Inventory.TButton')
+        sell_btn.grid(row=11, column=0, columnspan=2, pady=12)
         sell_dialog.grab_set()
-        name_entry.focus()
+        # With no item picked from the list the dialog opens ready to scan
+        (name_entry if item else scan_entry).focus()
 
-    def show_bill(self, name, quantity, price, total, discount_percent, discount, final_total, timestamp, customer_name, contact_number):
+    def show_bill(self, lines, timestamp, customer_name, contact_number):
         bill_dialog = tk.Toplevel(self.root)
         bill_dialog.title('Print Bill')
         bill_dialog.configure(bg='#f0f4f8')
-        bill_text = f"BILL\nDate/Time: {timestamp}\n-----------------------------\nCustomer Name: {customer_name}\nContact Number: {contact_number}\n-----------------------------\nItem: {name}\nQuantity: {quantity}\nPrice per item: {price}\nTotal: {total}\nDiscount: {discount_percent}%\nDiscount Price: {discount}\nFinal Total: {final_total}\n-----------------------------\nThank you for your purchase!"
-        text_widget = tk.Text(bill_dialog, width=40, height=16, font=('Segoe UI', 12), bg='#f8fafc', bd=0)
+        bill = {'timestamp': timestamp, 'customer_name': customer_name, 'contact_number': contact_number, 'lines': lines}
+        bill_text = pdf_reports.bill_text(bill)
+        text_widget = tk.Text(bill_dialog, width=40, height=min(bill_text.count('\n') + 1, 30), font=('Segoe UI', 12), bg='#f8fafc', bd=0)
         text_widget.insert('1.0', bill_text)
         text_widget.config(state='disabled')
         text_widget.pack(padx=10, pady=10)
         def print_bill_pdf():
             try:
-                from reportlab.lib.pagesizes import letter
-                from reportlab.pdfgen import canvas
-                import os
+                file_name = pdf_reports.render_bill(bill)
             except ImportError:
-                messagebox.showerror('Missing Library', 'reportlab is required to save PDF. Please install it with:\npip install reportlab')
+                messagebox.showerror('Missing Library', REPORTLAB_MISSING)
                 return
-            # Prepare billing folder structure: billing/<month_name>/<date>/
-            bill_dt = None
-            try:
-                bill_dt = datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
-            except Exception:
-                bill_dt = datetime.datetime.now()
-            month_name = bill_dt.strftime('%B')
-            date_str = bill_dt.strftime('%Y-%m-%d')
-            billing_folder = os.path.join('billing', month_name, date_str)
-            if not os.path.exists(billing_folder):
-                os.makedirs(billing_folder)
-            # Prepare file name with contact number and datetime
-            safe_contact = str(contact_number).replace(' ', '').replace('/', '').replace('\\', '')
-            safe_datetime = timestamp.replace(':', '').replace(' ', '_').replace('-', '')
-            file_name = os.path.join(billing_folder, f"bill_{safe_contact}_{safe_datetime}.pdf")
-            c = canvas.Canvas(file_name, pagesize=letter)
-            width, height = letter
-            y = height - 50
-            c.setFont('Helvetica-Bold', 16)
-            c.drawString(50, y, 'BILL')
-            c.setFont('Helvetica', 12)
-            y -= 30
-            c.drawString(50, y, f'Date/Time: {timestamp}')
-            y -= 20
-            c.drawString(50, y, '-----------------------------')
-            y -= 20
-            c.drawString(50, y, f'Customer Name: {customer_name}')
-            y -= 20
-            c.drawString(50, y, f'Contact Number: {contact_number}')
-            y -= 20
-            c.drawString(50, y, '-----------------------------')
-            y -= 20
-            c.drawString(50, y, f'Item: {name}')
-            y -= 20
-            c.drawString(50, y, f'Quantity: {quantity}')
-            y -= 20
-            c.drawString(50, y, f'Price per item: {price}')
-            y -= 20
-            c.drawString(50, y, f'Total: {total}')
-            y -= 20
-            c.drawString(50, y, f'Discount: {discount_percent}%')
-            y -= 20
-            c.drawString(50, y, f'Discount Price: {discount}')
-            y -= 20
-            c.drawString(50, y, f'Final Total: {final_total}')
-            y -= 20
-            c.drawString(50, y, '-----------------------------')
-            y -= 30
-            c.drawString(50, y, 'Thank you for your purchase!')
-            c.save()
             messagebox.showinfo('Bill Saved', f'Bill saved as {file_name}')
             bill_dialog.destroy()
         ttk.Button(bill_dialog, text='Print/Save Bill (PDF)', command=print_bill_pdf, style='Inventory.TButton').pack(pady=10)
@@ -652,98 +744,169 @@ class InventoryApp:
         stock_dialog.title('Current Stock')
         stock_dialog.configure(bg='#f0f4f8')
         columns = ('ID', 'Name', 'Quantity', 'Price', 'Total Price')
-        tree = ttk.Treeview(stock_dialog, columns=columns, show='headings', height=10)
-        tree.heading('ID', text='ID')
-        tree.heading('Name', text='Name')
-        tree.heading('Quantity', text='Quantity')
-        tree.heading('Price', text='Price')
-        tree.heading('Total Price', text='Total Price')
-        tree.column('ID', width=50, anchor='center')
-        tree.column('Name', width=150, anchor='center')
-        tree.column('Quantity', width=80, anchor='center')
-        tree.column('Price', width=80, anchor='center')
-        tree.column('Total Price', width=100, anchor='center')
-        tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
-        for idx, item in enumerate(self.inventory, 1):
-            total_price = item['quantity'] * item['price']
-            tree.insert('', 'end', values=(idx, item['name'], item['quantity'], item['price'], total_price))
-        scrollbar = ttk.Scrollbar(stock_dialog, orient='vertical', command=tree.yview)
-        scrollbar.pack(side='right', fill='y')
-        tree.configure(yscrollcommand=scrollbar.set)
+        source = KeysetSource('inventory', 'id, name, quantity, price')
+        table = VirtualTable(stock_dialog, columns, source, height=10,
+                             render=lambda position, row: (position + 1, row[1], row[2], row[3], row[2] * row[3]))
+        table.tree.column('ID', width=50, anchor='center')
+        table.tree.column('Name', width=150, anchor='center')
+        table.tree.column('Quantity', width=80, anchor='center')
+        table.tree.column('Price', width=80, anchor='center')
+        table.tree.column('Total Price', width=100, anchor='center')
+        table.pack(fill='both', expand=True, padx=10, pady=10)
+        self.watch_changes(stock_dialog, ('inventory',), table.refresh)
         ttk.Button(stock_dialog, text='Close', command=stock_dialog.destroy, style='Inventory.TButton').pack(pady=10)
         stock_dialog.grab_set()
 
     def view_history(self):
-        history = load_sell_history()
         history_dialog = tk.Toplevel(self.root)
         history_dialog.title('Sell History')
         history_dialog.configure(bg='#f0f4f8')
         columns = ('No.', 'Name', 'Quantity Sold', 'Price', 'Total Sale', 'Discount (%)', 'Discount Price', 'Final Total', 'Cost Price', 'Customer Name', 'Contact Number', 'Timestamp')
-        # Frame for tree and scrollbars
-        tree_frame = ttk.Frame(history_dialog)
-        tree_frame.pack(fill='both', expand=True, padx=10, pady=10)
-        tree = ttk.Treeview(tree_frame, columns=columns, show='headings')
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, anchor='center', stretch=True, width=120)
-        # Scrollbars
-        xscrollbar = ttk.Scrollbar(tree_frame, orient='horizontal', command=tree.xview)
-        yscrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
-        tree.configure(xscrollcommand=xscrollbar.set, yscrollcommand=yscrollbar.set)
-        tree.grid(row=0, column=0, sticky='nsew')
-        yscrollbar.grid(row=0, column=1, sticky='ns')
-        xscrollbar.grid(row=1, column=0, sticky='ew')
-        tree_frame.rowconfigure(0, weight=1)
-        tree_frame.columnconfigure(0, weight=1)
-        for idx, entry in enumerate(history, 1):
-            if isinstance(entry, dict):
-                tree.insert('', 'end', values=(
-                    idx,
-                    entry.get('name', ''),
-                    entry.get('quantity_sold', ''),
-                    entry.get('price', ''),
-                    entry.get('total_sale', ''),
-                    entry.get('discount_percent', 0),
-                    entry.get('discount_price', 0),
-                    entry.get('final_total', entry.get('total_sale', 0)),
-                    entry.get('cost_price', 0),
-                    entry.get('customer_name', ''),
-                    entry.get('contact_number', ''),
-                    entry.get('timestamp', '')
-                ))
+        table = VirtualTable(history_dialog, columns, SellHistorySource('newest'), column_width=120,
+                             render=lambda position, entry: (position + 1, entry.name, entry.quantity_sold, entry.price,
+                                                              entry.total_sale, entry.discount_percent, entry.discount_price,
+                                                              entry.final_total, entry.cost_price, entry.customer_name,
+                                                              entry.contact_number, entry.timestamp))
+        table.pack(fill='both', expand=True, padx=10, pady=10)
+        self.history_filter_bar(history_dialog, lambda sort, filters: table.set_source(SellHistorySource(sort, **filters)),
+                                'newest').pack(fill='x', padx=10, pady=(10, 0), before=table)
+        self.watch_changes(history_dialog, ('sell_history',), table.refresh)
         btn_frame = ttk.Frame(history_dialog, style='Inventory.TFrame')
         btn_frame.pack(pady=10)
-        ttk.Button(btn_frame, text='Export as Excel', command=self.export_sell_history_excel, style='Inventory.TButton').pack(side='left', padx=5)
+        ttk.Button(btn_frame, text='Export...', command=self.export_sell_history, style='Inventory.TButton').pack(side='left', padx=5)
         ttk.Button(btn_frame, text='Close', command=history_dialog.destroy, style='Inventory.TButton').pack(side='left', padx=5)
         history_dialog.grab_set()
 
-    def export_sell_history_excel(self):
-        try:
-            import pandas as pd
-            import os
-        except ImportError:
-            from tkinter import messagebox
-            messagebox.showerror('Missing Library', 'pandas is required to export Excel. Please install it with:\npip install pandas openpyxl')
-            return
-        history = load_sell_history()
-        if not history:
-            from tkinter import messagebox
-            messagebox.showinfo('No Data', 'No sell history to export.')
+    def export_sell_history(self):
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Export Sell History')
+        dialog.configure(bg='#f0f4f8')
+        ttk.Label(dialog, text='Format:', style='Inventory.TLabel').grid(row=0, column=0, pady=8, padx=8, sticky='e')
+        format_var = tk.StringVar(value='Excel')
+        ttk.Combobox(dialog, textvariable=format_var, values=list(EXPORT_FORMATS), state='readonly', width=22).grid(row=0, column=1, pady=8, padx=8)
+        entries = {}
+        for row, (key, text) in enumerate((('date_from', 'From (YYYY-MM-DD):'), ('date_to', 'To (YYYY-MM-DD):'),
+                                           ('item_name', 'Item Name:'), ('customer_name', 'Customer Name:'),
+                                           ('contact_number', 'Contact Number:')), 1):
+            ttk.Label(dialog, text=text, style='Inventory.TLabel').grid(row=row, column=0, pady=8, padx=8, sticky='e')
+            entries[key] = ttk.Entry(dialog, width=25, style='TEntry')
+            entries[key].grid(row=row, column=1, pady=8, padx=8)
+        def submit():
+            filters = {key: entry.get().strip() or None for key, entry in entries.items()}
+            try:
+                for key in ('date_from', 'date_to'):
+                    if filters[key]:
+                        datetime.date.fromisoformat(filters[key])
+            except ValueError:
+                messagebox.showerror('Error', 'Dates must be in YYYY-MM-DD format.')
+                return
+            reports_folder = 'reports'
+            if not os.path.exists(reports_folder):
+                os.makedirs(reports_folder)
+            now_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            file_name = os.path.join(reports_folder, f'sell_history_{now_str}{EXPORT_FORMATS[format_var.get()]}')
+            def done(written):
+                if written:
+                    messagebox.showinfo('Exported', f'Sell history exported as {file_name}')
+                else:
+                    messagebox.showinfo('No Data', 'No sell history to export.')
+            def failed(e):
+                if isinstance(e, ImportError):
+                    messagebox.showerror('Missing Library', f'{e.name} is required for this format. Please install it with:\npip install {e.name}')
+                else:
+                    messagebox.showerror('Error', f'Failed to export: {e}')
+            dialog.destroy()
+            self.run_job('Exporting sell history', export_sell_history, file_name, on_done=done, on_error=failed, **filters)
+        ttk.Button(dialog, text='Export', command=submit, style='Inventory.TButton').grid(row=6, column=0, columnspan=2, pady=12)
+        dialog.grab_set()
+
+    def run_pdf_job(self, render, label=None, title='Saving PDF', on_done=None):
+        # on_done defaults to announcing the single file render returns
+        def failed(e):
+            if isinstance(e, ImportError):
+                messagebox.showerror('Missing Library', REPORTLAB_MISSING)
+            else:
+                show_error(e)
+        if on_done is None:
+            on_done = lambda file_name: messagebox.showinfo('Exported', f'{label} saved as {file_name}')
+        self.run_job(title, render, on_done=on_done, on_error=failed)
+
+    def reprint_bills(self):
+        date_str = simpledialog.askstring('Reprint Bills', 'Reprint every bill of the day (YYYY-MM-DD):',
+                                          initialvalue=datetime.date.today().isoformat(), parent=self.root)
+        if not date_str:
             return
-        df = pd.DataFrame(history)
-        reports_folder = 'reports'
-        if not os.path.exists(reports_folder):
-            os.makedirs(reports_folder)
-        import datetime
-        now_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_name = os.path.join(reports_folder, f'sell_history_{now_str}.xlsx')
         try:
-            df.to_excel(file_name, index=False)
-            from tkinter import messagebox
-            messagebox.showinfo('Exported', f'Sell history exported as {file_name}')
-        except Exception as e:
-            from tkinter import messagebox
-            messagebox.showerror('Error', f'Failed to export Excel: {e}')
+            datetime.date.fromisoformat(date_str.strip())
+        except ValueError:
+            messagebox.showerror('Error', 'Dates must be in YYYY-MM-DD format.')
+            return
+        def render(job):
+            history = load_sell_history(date_from=date_str.strip(), date_to=date_str.strip())
+            return pdf_reports.render_bills(pdf_reports.bills_from_history(history), job)
+        def done(file_names):
+            if file_names:
+                messagebox.showinfo('Bills Saved', f'{len(file_names)} bills saved under {os.path.dirname(file_names[0])}')
+            else:
+                messagebox.showinfo('No Data', f'No sales on {date_str}.')
+        self.run_pdf_job(render, title='Reprinting bills', on_done=done)
+
+    def run_job(self, title, fn, *args, on_done=None, on_error=show_error, **kwargs):
+        # Runs fn(job, *args, **kwargs) in the background behind a small progress window with a Cancel button
+        progress_dialog = tk.Toplevel(self.root)
+        progress_dialog.title(title)
+        progress_dialog.configure(bg='#f0f4f8')
+        progress_dialog.transient(self.root)
+        ttk.Label(progress_dialog, text=f'{title}...', style='TLabel').pack(padx=20, pady=(15, 5))
+        bar = ttk.Progressbar(progress_dialog, length=250, mode='indeterminate')
+        bar.pack(padx=20, pady=5)
+        bar.start()
+        # A report dialog may hold the grab; it gets it back when the job ends
+        previous_grab = progress_dialog.grab_current()
+        progress_dialog.grab_set()
+        def close():
+            if progress_dialog.winfo_exists():
+                progress_dialog.destroy()
+            if previous_grab is not None and previous_grab.winfo_exists():
+                previous_grab.grab_set()
+        def progress(done, total):
+            if not progress_dialog.winfo_exists() or not total:
+                return
+            if str(bar.cget('mode')) != 'determinate':
+                bar.stop()
+                bar.config(mode='determinate', maximum=total)
+            bar.config(value=done)
+        def finished(result):
+            close()
+            if on_done:
+                on_done(result)
+        def failed(error):
+            close()
+            on_error(error)
+        job = self.worker.submit(fn, *args, on_done=finished, on_error=failed, on_progress=progress, **kwargs)
+        def cancel():
+            job.cancel()
+            close()
+        ttk.Button(progress_dialog, text='Cancel', command=cancel, style='Inventory.TButton').pack(pady=(5, 15))
+        progress_dialog.protocol('WM_DELETE_WINDOW', cancel)
+        return job
+
+    def run_write(self, button, fn, *args, on_done=None, on_error=show_error):
+        # Runs fn(*args) in the background: a write can wait out another till's lock and its retries.
+        # button, if given, stays disabled meanwhile so a second click cannot write twice.
+        if button is not None:
+            button.state(['disabled'])
+        def enable():
+            if button is not None and button.winfo_exists():
+                button.state(['!disabled'])
+        def finished(result):
+            enable()
+            if on_done:
+                on_done(result)
+        def failed(error):
+            enable()
+            on_error(error)
+        return self.worker.submit(lambda job: fn(*args), on_done=finished, on_error=failed)
 
     def add_user(self):
         dialog = tk.Toplevel(self.root)
@@ -766,15 +929,18 @@ class InventoryApp:
             if not username or not password:
                 messagebox.showerror('Error', 'Username and password cannot be empty!')
                 return
-            if find_user_by_username(self.users, username):
-                messagebox.showerror('Error', 'Username already exists!')
-                return
-            new_id = get_next_user_id(self.users)
-            self.users.append({'id': new_id, 'username': username, 'password': password, 'role': role})
-            save_users(self.users)
-            messagebox.showinfo('Success', f"User '{username}' added!")
-            dialog.destroy()
-        ttk.Button(dialog, text='Add User', command=submit, style='Inventory.TButton').grid(row=3, column=0, columnspan=2, pady=12)
+            def added(result):
+                messagebox.showinfo('Success', f"User '{username}' added!")
+                dialog.destroy()
+            def failed(e):
+                if isinstance(e, DuplicateUsername):
+                    messagebox.showerror('Error', 'Username already exists!')
+                else:
+                    show_error(e)
+            # Hashing the password takes a few hundred milliseconds, too long for the Tk thread
+            self.run_write(add_btn, create_user, username, password, role, on_done=added, on_error=failed)
+        add_btn = ttk.Button(dialog, text='Add User', command=submit, style='Inventory.TButton')
+        add_btn.grid(row=3, column=0, columnspan=2, pady=12)
         ttk.Button(dialog, text='Cancel', command=dialog.destroy, style='Inventory.TButton').grid(row=4, column=0, columnspan=2, pady=5)
         dialog.grab_set()
         username_entry.focus()
@@ -792,8 +958,9 @@ class InventoryApp:
         tree.column('Username', width=120, anchor='center')
         tree.column('Role', width=80, anchor='center')
         tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
-        for user in self.users:
-            tree.insert('', 'end', values=(user['id'], user['username'], user['role']))
+        users = {user.id: user for user in load_users()}
+        for user in users.values():
+            tree.insert('', 'end', values=(user.id, user.username, user.role))
         scrollbar = ttk.Scrollbar(dialog, orient='vertical', command=tree.yview)
         scrollbar.pack(side='right', fill='y')
         tree.configure(yscrollcommand=scrollbar.set)
@@ -805,7 +972,7 @@ class InventoryApp:
                 messagebox.showerror('Error', 'No user selected!')
                 return
             user_id = int(tree.item(selection[0])['values'][0])
-            user = find_user_by_id(self.users, user_id)
+            user = users.get(user_id)
             if user is None:
                 messagebox.showerror('Error', 'User not found!')
                 return
@@ -816,35 +983,32 @@ class InventoryApp:
             edit_dialog.title('Edit User')
             edit_dialog.configure(bg='#f0f4f8')
             ttk.Label(edit_dialog, text='ID:', style='Inventory.TLabel').grid(row=0, column=0, pady=8, padx=8, sticky='e')
-            ttk.Label(edit_dialog, text=str(user['id']), style='Inventory.TLabel').grid(row=0, column=1, pady=8, padx=8, sticky='w')
+            ttk.Label(edit_dialog, text=str(user.id), style='Inventory.TLabel').grid(row=0, column=1, pady=8, padx=8, sticky='w')
             ttk.Label(edit_dialog, text='Username:', style='Inventory.TLabel').grid(row=1, column=0, pady=8, padx=8, sticky='e')
-            ttk.Label(edit_dialog, text=user['username'], style='Inventory.TLabel').grid(row=1, column=1, pady=8, padx=8, sticky='w')
+            ttk.Label(edit_dialog, text=user.username, style='Inventory.TLabel').grid(row=1, column=1, pady=8, padx=8, sticky='w')
             ttk.Label(edit_dialog, text='Password:', style='Inventory.TLabel').grid(row=2, column=0, pady=8, padx=8, sticky='e')
-            password_entry = ttk.Entry(edit_dialog, width=25, style='TEntry')
-            password_entry.insert(0, user['password'])
+            # Only a hash is stored, so the field starts empty; left empty it keeps the current password
+            password_entry = ttk.Entry(edit_dialog, width=25, style='TEntry', show='*')
             password_entry.grid(row=2, column=1, pady=8, padx=8)
             ttk.Label(edit_dialog, text='Role:', style='Inventory.TLabel').grid(row=3, column=0, pady=8, padx=8, sticky='e')
-            role_var = tk.StringVar(value=user['role'])
+            role_var = tk.StringVar(value=user.role)
             role_combo = ttk.Combobox(edit_dialog, textvariable=role_var, values=['admin', 'user'], state='readonly', width=22)
             role_combo.grid(row=3, column=1, pady=8, padx=8)
             def save_edit():
                 new_password = password_entry.get().strip()
                 new_role = role_var.get()
-                if not new_password:
-                    messagebox.showerror('Error', 'Password cannot be empty!')
-                    return
-                user['password'] = new_password
-                user['role'] = new_role
-                save_users(self.users)
-                messagebox.showinfo('Success', f"User '{user['username']}' updated!")
-                edit_dialog.destroy()
-                dialog.destroy()
-                self.manage_users()
-            ttk.Button(edit_dialog, text='Save', command=save_edit, style='Inventory.TButton').grid(row=4, column=0, columnspan=2, pady=12)
+                def saved(result):
+                    messagebox.showinfo('Success', f"User '{user.username}' updated!")
+                    edit_dialog.destroy()
+                    dialog.destroy()
+                    self.manage_users()
+                self.run_write(save_btn, change_user, user.id, new_role, new_password or None, on_done=saved)
+            save_btn = ttk.Button(edit_dialog, text='Save', command=save_edit, style='Inventory.TButton')
+            save_btn.grid(row=4, column=0, columnspan=2, pady=12)
             ttk.Button(edit_dialog, text='Cancel', command=edit_dialog.destroy, style='Inventory.TButton').grid(row=5, column=0, columnspan=2, pady=5)
             edit_dialog.grab_set()
             password_entry.focus()
-        def delete_user():
+        def delete_selected_user():
             selection = tree.selection()
             if not selection:
                 messagebox.showerror('Error', 'No user selected!')
@@ -853,31 +1017,24 @@ class InventoryApp:
             if user_id == getattr(self, 'current_user_id', None):
                 messagebox.showerror('Error', 'You cannot delete yourself.')
                 return
-            user = find_user_by_id(self.users, user_id)
+            user = users.get(user_id)
             if user is None:
                 messagebox.showerror('Error', 'User not found!')
                 return
-            if messagebox.askyesno('Confirm', f"Delete user '{user['username']}'?"):
-                self.users = [u for u in self.users if u['id'] != user_id]
-                save_users(self.users)
-                messagebox.showinfo('Success', f"User '{user['username']}' deleted!")
+            if not messagebox.askyesno('Confirm', f"Delete user '{user.username}'?"):
+                return
+            def deleted(result):
+                messagebox.showinfo('Success', f"User '{user.username}' deleted!")
                 dialog.destroy()
                 self.manage_users()
+            self.run_write(delete_btn, delete_user, user_id, on_done=deleted)
         ttk.Button(btn_frame, text='Edit User', command=edit_user, style='Inventory.TButton').grid(row=0, column=0, padx=5)
-        ttk.Button(btn_frame, text='Delete User', command=delete_user, style='Inventory.TButton').grid(row=0, column=1, padx=5)
+        delete_btn = ttk.Button(btn_frame, text='Delete User', command=delete_selected_user, style='Inventory.TButton')
+        delete_btn.grid(row=0, column=1, padx=5)
         ttk.Button(btn_frame, text='Close', command=dialog.destroy, style='Inventory.TButton').grid(row=0, column=2, padx=5)
         dialog.grab_set()
 
     def customer_list(self):
-        # Gather unique customers from sell history
-        history = load_sell_history()
-        customers = {}
-        for entry in history:
-            if isinstance(entry, dict):
-                key = (entry.get('customer_name', ''), entry.get('contact_number', ''))
-                if key[0] and key[1]:
-                    customers[key] = True
-        customer_list = list(customers.keys())
         dialog = tk.Toplevel(self.root)
         dialog.title('Customer List')
         dialog.configure(bg='#f0f4f8')
@@ -890,10 +1047,19 @@ class InventoryApp:
         tree.column('Customer Name', width=150, anchor='center')
         tree.column('Contact Number', width=120, anchor='center')
         tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
-        for idx, customer in enumerate(customer_list, 1):
-            name = customer[0] if len(customer) > 0 else ''
-            contact = customer[1] if len(customer) > 1 else ''
-            tree.insert('', 'end', values=(idx, name, contact))
+        def show(customers):
+            if not dialog.winfo_exists():
+                return
+            customer_list = [(customer['customer_name'], customer['contact_number']) for customer in customers
+                             if customer['customer_name'] and customer['contact_number']]
+            tree.delete(*tree.get_children())
+            for idx, (name, contact) in enumerate(customer_list, 1):
+                tree.insert('', 'end', values=(idx, name, contact))
+        def fill():
+            # One row per customer from the daily customer rollup rather than a pass over every sale
+            self.worker.submit(lambda job: customer_period_totals(), on_done=show)
+        fill()
+        self.watch_changes(dialog, ('sell_history',), fill)
         scrollbar = ttk.Scrollbar(dialog, orient='vertical', command=tree.yview)
         scrollbar.pack(side='right', fill='y')
         tree.configure(yscrollcommand=scrollbar.set)
@@ -904,9 +1070,9 @@ class InventoryApp:
             if not selection:
                 messagebox.showerror('Error', 'No customer selected!')
                 return
-            item = tree.item(selection[0])['values']
-            old_name = item[1] if len(item) > 1 else ''
-            old_contact = item[2] if len(item) > 2 else ''
+            # tree.set gives the text as shown; the row's values would turn a contact like 0123456789 into an int
+            old_name = tree.set(selection[0], 'Customer Name')
+            old_contact = tree.set(selection[0], 'Contact Number')
             edit_dialog = tk.Toplevel(dialog)
             edit_dialog.title('Edit Customer')
             edit_dialog.configure(bg='#f0f4f8')
@@ -933,24 +1099,19 @@ class InventoryApp:
                 if not re.fullmatch(r'\d{10}', new_contact):
                     messagebox.showerror('Error', 'Contact number must be exactly 10 digits!')
                     return
-                # Update all sell history entries for this customer
-                history = load_sell_history()
-                updated = False
-                for entry in history:
-                    if isinstance(entry, dict):
-                        if entry.get('customer_name', '') == old_name and entry.get('contact_number', '') == old_contact:
-                            entry['customer_name'] = new_name
-                            entry['contact_number'] = new_contact
-                            updated = True
-                if updated:
-                    save_sell_history(history)
+                # One UPDATE in the database; rollup and autofill cache follow the new details
+                def renamed(changed):
+                    if not changed:
+                        messagebox.showinfo('Info', 'No matching customer found in history.')
+                        return
+                    self.customers.forget(old_contact, new_contact)
                     messagebox.showinfo('Success', 'Customer details updated!')
                     edit_dialog.destroy()
                     dialog.destroy()
                     self.customer_list()
-                else:
-                    messagebox.showinfo('Info', 'No matching customer found in history.')
-            ttk.Button(edit_dialog, text='Save', command=save_edit, style='Inventory.TButton').grid(row=2, column=0, columnspan=2, pady=12)
+                self.run_write(save_btn, rename_customer, old_name, old_contact, new_name, new_contact, on_done=renamed)
+            save_btn = ttk.Button(edit_dialog, text='Save', command=save_edit, style='Inventory.TButton')
+            save_btn.grid(row=2, column=0, columnspan=2, pady=12)
             ttk.Button(edit_dialog, text='Cancel', command=edit_dialog.destroy, style='Inventory.TButton').grid(row=3, column=0, columnspan=2, pady=5)
             edit_dialog.grab_set()
             name_entry.focus()
@@ -963,65 +1124,28 @@ class InventoryApp:
         dialog.title('Stock Report')
         dialog.configure(bg='#f0f4f8')
         columns = ('Name', 'Quantity', 'Price', 'Total Price')
-        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=10)
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, anchor='center')
-        tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
-        grand_total = 0
-        for item in self.inventory:
-            total_price = item['quantity'] * item['price']
-            grand_total += total_price
-            tree.insert('', 'end', values=(item['name'], item['quantity'], item['price'], total_price))
-        scrollbar = ttk.Scrollbar(dialog, orient='vertical', command=tree.yview)
-        scrollbar.pack(side='right', fill='y')
-        tree.configure(yscrollcommand=scrollbar.set)
-        grand_total_label = ttk.Label(dialog, text=f'Grand Total: {grand_total}', font=('Segoe UI', 12, 'bold'), background='#f0f4f8')
+        source = KeysetSource('inventory', 'id, name, quantity, price')
+        table = VirtualTable(dialog, columns, source, height=10,
+                             render=lambda position, row: (row[1], row[2], row[3], row[2] * row[3]))
+        table.pack(fill='both', expand=True, padx=10, pady=10)
+        grand_total_label = ttk.Label(dialog, font=('Segoe UI', 12, 'bold'), background='#f0f4f8')
         grand_total_label.pack(pady=5)
+        def show_grand_total():
+            grand_total_label.configure(text=f'Grand Total: {sum(item.quantity * item.price for item in self.inventory)}')
+        def inventory_changed():
+            table.refresh()
+            show_grand_total()
+        show_grand_total()
+        self.watch_changes(dialog, ('inventory',), inventory_changed)
         def export_pdf():
-            try:
-                from reportlab.lib.pagesizes import letter
-                from reportlab.pdfgen import canvas
-                import os
-            except ImportError:
-                messagebox.showerror('Missing Library', 'reportlab is required to save PDF. Please install it with:\npip install reportlab')
-                return
-            reports_folder = 'reports'
-            if not os.path.exists(reports_folder):
-                os.makedirs(reports_folder)
-            import datetime
-            now_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            file_name = os.path.join(reports_folder, f'stock_report_{now_str}.pdf')
-            c = canvas.Canvas(file_name, pagesize=letter)
-            width, height = letter
-            y = height - 50
-            c.setFont('Helvetica-Bold', 16)
-            c.drawString(50, y, 'Stock Report')
-            c.setFont('Helvetica', 12)
-            y -= 30
-            c.drawString(50, y, f'Date/Time: {now_str}')
-            y -= 30
-            c.drawString(50, y, 'Name')
-            c.drawString(200, y, 'Quantity')
-            c.drawString(300, y, 'Price')
-            c.drawString(400, y, 'Total Price')
-            y -= 20
-            c.line(50, y, 500, y)
-            y -= 20
-            for item in self.inventory:
-                c.drawString(50, y, str(item['name']))
-                c.drawString(200, y, str(item['quantity']))
-                c.drawString(300, y, str(item['price']))
-                c.drawString(400, y, str(item['quantity'] * item['price']))
-                y -= 20
-                if y < 80:
-                    c.showPage()
-                    y = height - 50
-            y -= 10
-            c.setFont('Helvetica-Bold', 12)
-            c.drawString(50, y, f'Grand Total: {grand_total}')
-            c.save()
-            messagebox.showinfo('Exported', f'Stock report saved as {file_name}')
+            rows = [(item.name, item.quantity, item.price, item.quantity * item.price) for item in self.inventory]
+            grand_total = sum(row[3] for row in rows)
+            def render(job):
+                file_name = pdf_reports.report_file_name('stock_report', now_str)
+                return pdf_reports.render_table(file_name, pdf_reports.STOCK_TEMPLATE, now_str, rows, job, len(rows),
+                                                footer=f'Grand Total: {grand_total}')
+            now_str = pdf_reports.now_stamp()
+            self.run_pdf_job(render, 'Stock report')
         ttk.Button(dialog, text='Export as PDF', command=export_pdf).pack(pady=10)
         ttk.Button(dialog, text='Close', command=dialog.destroy).pack(pady=5)
         dialog.grab_set()
@@ -1031,85 +1155,80 @@ class InventoryApp:
         dialog.title('Sales Report')
         dialog.configure(bg='#f0f4f8')
         columns = ('Date/Time', 'Item Name', 'Quantity Sold', 'Price', 'Total Sale', 'Discount (%)', 'Discount Price', 'Final Total', 'Customer Name', 'Contact Number')
-        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=15)
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, anchor='center')
-        tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
-        history = load_sell_history()
-        for entry in history:
-            if isinstance(entry, dict):
-                tree.insert('', 'end', values=(
-                    entry.get('timestamp', ''),
-                    entry.get('name', ''),
-                    entry.get('quantity_sold', ''),
-                    entry.get('price', ''),
-                    entry.get('total_sale', ''),
-                    entry.get('discount_percent', 0),
-                    entry.get('discount_price', 0),
-                    entry.get('final_total', entry.get('total_sale', 0)),
-                    entry.get('customer_name', ''),
-                    entry.get('contact_number', ''),
-                ))
-        scrollbar = ttk.Scrollbar(dialog, orient='vertical', command=tree.yview)
-        scrollbar.pack(side='right', fill='y')
-        tree.configure(yscrollcommand=scrollbar.set)
+        sales_row = lambda entry: (entry.timestamp, entry.name, entry.quantity_sold, entry.price, entry.total_sale,
+                                   entry.discount_percent, entry.discount_price, entry.final_total, entry.customer_name,
+                                   entry.contact_number)
+        # The PDF holds the rows shown: same filters, same order
+        query = {'sort': 'oldest'}
+        table = VirtualTable(dialog, columns, SellHistorySource(**query), render=lambda position, entry: sales_row(entry))
+        table.pack(fill='both', expand=True, padx=10, pady=10)
+        def apply_filters(sort, filters):
+            query.clear()
+            query.update(filters, sort=sort)
+            table.set_source(SellHistorySource(**query))
+        self.history_filter_bar(dialog, apply_filters, 'oldest').pack(fill='x', padx=10, pady=(10, 0), before=table)
+        self.watch_changes(dialog, ('sell_history',), table.refresh)
         def export_pdf():
-            try:
-                from reportlab.lib.pagesizes import letter
-                from reportlab.pdfgen import canvas
-                import os
-            except ImportError:
-                messagebox.showerror('Missing Library', 'reportlab is required to save PDF. Please install it with:\npip install reportlab')
-                return
-            reports_folder = 'reports'
-            if not os.path.exists(reports_folder):
-                os.makedirs(reports_folder)
-            import datetime
-            now_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            file_name = os.path.join(reports_folder, f'sales_report_{now_str}.pdf')
-            c = canvas.Canvas(file_name, pagesize=letter)
-            width, height = letter
-            y = height - 50
-            c.setFont('Helvetica-Bold', 16)
-            c.drawString(50, y, 'Sales Report')
-            c.setFont('Helvetica', 12)
-            y -= 30
-            c.drawString(50, y, f'Date/Time: {now_str}')
-            y -= 30
-            headers = ['Date/Time', 'Item', 'Qty', 'Price', 'Total', 'Disc(%)', 'Disc Amt', 'Final', 'Cust Name', 'Contact']
-            x_positions = [50, 120, 200, 240, 290, 350, 410, 470, 530, 600]
-            for i, h in enumerate(headers):
-                c.drawString(x_positions[i], y, h)
-            y -= 20
-            c.line(50, y, 700, y)
-            y -= 20
-            for entry in history:
-                if isinstance(entry, dict):
-                    row = [
-                        entry.get('timestamp', ''),
-                        entry.get('name', ''),
-                        entry.get('quantity_sold', ''),
-                        entry.get('price', ''),
-                        entry.get('total_sale', ''),
-                        entry.get('discount_percent', 0),
-                        entry.get('discount_price', 0),
-                        entry.get('final_total', entry.get('total_sale', 0)),
-                        entry.get('customer_name', ''),
-                        entry.get('contact_number', ''),
-                    ]
-                    for i, val in enumerate(row):
-                        c.drawString(x_positions[i], y, str(val))
-                    y -= 20
-                    if y < 80:
-                        c.showPage()
-                        y = height - 50
-            c.save()
-            messagebox.showinfo('Exported', f'Sales report saved as {file_name}')
+            def render(job):
+                file_name = pdf_reports.report_file_name('sales_report', now_str)
+                rows = map(sales_row, iter_sell_history(**shown_query))
+                return pdf_reports.render_table(file_name, pdf_reports.SALES_TEMPLATE, now_str, rows, job, total)
+            now_str = pdf_reports.now_stamp()
+            shown_query = dict(query)
+            total = table.total
+            self.run_pdf_job(render, 'Sales report')
         ttk.Button(dialog, text='Export as PDF', command=export_pdf).pack(pady=10)
         ttk.Button(dialog, text='Close', command=dialog.destroy).pack(pady=5)
         dialog.grab_set()
 
+    def history_filter_bar(self, dialog, on_apply, sort):
+        # Date range, item, customer and contact filters and a sort order;
+        # on_apply receives the sort key and the sell_history_filter keywords that are set
+        frame = ttk.Frame(dialog, style='Inventory.TFrame')
+        entries = {}
+        for key, text, width in (('date_from', 'From (YYYY-MM-DD):', 12), ('date_to', 'To:', 12), ('item_name', 'Item:', 14),
+                                 ('customer_name', 'Customer:', 14), ('contact_number', 'Contact:', 12)):
+            ttk.Label(frame, text=text, style='Inventory.TLabel').pack(side='left')
+            entries[key] = ttk.Entry(frame, width=width)
+            entries[key].pack(side='left', padx=5)
+        sort_labels = {value: label for label, value in HISTORY_SORTS.items()}
+        sort_var = tk.StringVar(value=sort_labels[sort])
+        ttk.Combobox(frame, textvariable=sort_var, values=list(HISTORY_SORTS), state='readonly', width=12).pack(side='left', padx=5)
+        def apply():
+            filters = {key: entry.get().strip() for key, entry in entries.items() if entry.get().strip()}
+            try:
+                for key in ('date_from', 'date_to'):
+                    if key in filters:
+                        datetime.date.fromisoformat(filters[key])
+            except ValueError:
+                messagebox.showerror('Error', 'Dates must be in YYYY-MM-DD format.')
+                return
+            on_apply(HISTORY_SORTS[sort_var.get()], filters)
+        ttk.Button(frame, text='Apply', command=apply, style='Inventory.TButton').pack(side='left', padx=5)
+        return frame
+
+    def date_range_bar(self, dialog, on_apply):
+        # From/To date entries; on_apply receives YYYY-MM-DD strings or None for an open end
+        frame = ttk.Frame(dialog, style='Inventory.TFrame')
+        ttk.Label(frame, text='From (YYYY-MM-DD):', style='Inventory.TLabel').pack(side='left')
+        from_entry = ttk.Entry(frame, width=12)
+        from_entry.pack(side='left', padx=5)
+        ttk.Label(frame, text='To:', style='Inventory.TLabel').pack(side='left')
+        to_entry = ttk.Entry(frame, width=12)
+        to_entry.pack(side='left', padx=5)
+        def apply():
+            dates = [from_entry.get().strip() or None, to_entry.get().strip() or None]
+            try:
+                for value in dates:
+                    if value:
+                        datetime.date.fromisoformat(value)
+            except ValueError:
+                messagebox.showerror('Error', 'Dates must be in YYYY-MM-DD format.')
+                return
+            on_apply(*dates)
+        ttk.Button(frame, text='Apply', command=apply, style='Inventory.TButton').pack(side='left', padx=5)
+        return frame
+
     def customer_report(self):
         dialog = tk.Toplevel(self.root)
         dialog.title('Customer Report')
@@ -1119,61 +1238,33 @@ class InventoryApp:
         for col in columns:
             tree.heading(col, text=col)
             tree.column(col, anchor='center')
+        customers = []
+        def show(rows):
+            if not dialog.winfo_exists():
+                return
+            customers[:] = rows
+            tree.delete(*tree.get_children())
+            for data in customers:
+                tree.insert('', 'end', values=(data['customer_name'], data['contact_number'], data['purchases'], data['spent']))
+        dates = [None, None]
+        def load(date_from=None, date_to=None):
+            dates[:] = [date_from, date_to]
+            self.worker.submit(lambda job: customer_period_totals(date_from, date_to), on_done=show)
+        self.date_range_bar(dialog, load).pack(side='top', fill='x', padx=10, pady=(10, 0))
         tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
-        history = load_sell_history()
-        customers = {}
-        for entry in history:
-            if isinstance(entry, dict):
-                key = (entry.get('customer_name', ''), entry.get('contact_number', ''))
-                if key not in customers:
-                    customers[key] = {'purchases': 0, 'spent': 0}
-                customers[key]['purchases'] += 1
-                customers[key]['spent'] += float(entry.get('final_total', 0))
-        for (name, contact), data in customers.items():
-            tree.insert('', 'end', values=(name, contact, data['purchases'], data['spent']))
+        load()
+        self.watch_changes(dialog, ('sell_history',), lambda: load(*dates))
         scrollbar = ttk.Scrollbar(dialog, orient='vertical', command=tree.yview)
         scrollbar.pack(side='right', fill='y')
         tree.configure(yscrollcommand=scrollbar.set)
         def export_pdf():
-            try:
-                from reportlab.lib.pagesizes import letter
-                from reportlab.pdfgen import canvas
-                import os
-            except ImportError:
-                messagebox.showerror('Missing Library', 'reportlab is required to save PDF. Please install it with:\npip install reportlab')
-                return
-            reports_folder = 'reports'
-            if not os.path.exists(reports_folder):
-                os.makedirs(reports_folder)
-            import datetime
-            now_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            file_name = os.path.join(reports_folder, f'customer_report_{now_str}.pdf')
-            c = canvas.Canvas(file_name, pagesize=letter)
-            width, height = letter
-            y = height - 50
-            c.setFont('Helvetica-Bold', 16)
-            c.drawString(50, y, 'Customer Report')
-            c.setFont('Helvetica', 12)
-            y -= 30
-            c.drawString(50, y, f'Date/Time: {now_str}')
-            y -= 30
-            headers = ['Customer Name', 'Contact', 'Purchases', 'Total Spent']
-            x_positions = [50, 250, 400, 500]
-            for i, h in enumerate(headers):
-                c.drawString(x_positions[i], y, h)
-            y -= 20
-            c.line(50, y, 600, y)
-            y -= 20
-            for (name, contact), data in customers.items():
-                row = [name, contact, data['purchases'], data['spent']]
-                for i, val in enumerate(row):
-                    c.drawString(x_positions[i], y, str(val))
-                y -= 20
-                if y < 80:
-                    c.showPage()
-                    y = height - 50
-            c.save()
-            messagebox.showinfo('Exported', f'Customer report saved as {file_name}')
+            # Snapshot, since Apply may replace the rows while the PDF renders
+            rows = [(data['customer_name'], data['contact_number'], data['purchases'], data['spent']) for data in customers]
+            def render(job):
+                file_name = pdf_reports.report_file_name('customer_report', now_str)
+                return pdf_reports.render_table(file_name, pdf_reports.CUSTOMER_TEMPLATE, now_str, rows, job, len(rows))
+            now_str = pdf_reports.now_stamp()
+            self.run_pdf_job(render, 'Customer report')
         ttk.Button(dialog, text='Export as PDF', command=export_pdf).pack(pady=10)
         ttk.Button(dialog, text='Close', command=dialog.destroy).pack(pady=5)
         dialog.grab_set()
@@ -1182,121 +1273,132 @@ class InventoryApp:
         dialog = tk.Toplevel(self.root)
         dialog.title('Summary Report')
         dialog.configure(bg='#f0f4f8')
-        history = load_sell_history()
-        total_sales = 0
-        total_discount = 0
-        total_revenue = 0
-        num_sales = 0
-        for entry in history:
-            if isinstance(entry, dict):
-                total_sales += float(entry.get('total_sale', 0))
-                total_discount += float(entry.get('discount_price', 0))
-                total_revenue += float(entry.get('final_total', 0))
-                num_sales += 1
-        summary_text = (
-            f'Total Sales: {total_sales}\n'
-            f'Total Discount: {total_discount}\n'
-            f'Total Revenue: {total_revenue}\n'
-            f'Number of Sales: {num_sales}'
-        )
-        label = ttk.Label(dialog, text=summary_text, font=('Segoe UI', 13), background='#f0f4f8', justify='left')
+        summary = {}
+        label = ttk.Label(dialog, text='Loading...', font=('Segoe UI', 13), background='#f0f4f8', justify='left')
+        def show(totals):
+            if not dialog.winfo_exists():
+                return
+            summary.update(totals)
+            label.configure(text=(
+                f"Total Sales: {summary['total_sales']}\n"
+                f"Total Discount: {summary['total_discount']}\n"
+                f"Total Revenue: {summary['total_revenue']}\n"
+                f"Number of Sales: {summary['num_sales']}"
+            ))
+        dates = [None, None]
+        def load(date_from=None, date_to=None):
+            dates[:] = [date_from, date_to]
+            self.worker.submit(lambda job: period_totals(date_from, date_to), on_done=show)
+        self.date_range_bar(dialog, load).pack(fill='x', padx=10, pady=(10, 0))
         label.pack(padx=20, pady=20)
+        load()
+        self.watch_changes(dialog, ('sell_history',), lambda: load(*dates))
         def export_pdf():
-            try:
-                from reportlab.lib.pagesizes import letter
-                from reportlab.pdfgen import canvas
-                import os
-            except ImportError:
-                messagebox.showerror('Missing Library', 'reportlab is required to save PDF. Please install it with:\npip install reportlab')
+            if not summary:
                 return
-            reports_folder = 'reports'
-            if not os.path.exists(reports_folder):
-                os.makedirs(reports_folder)
-            import datetime
-            now_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            file_name = os.path.join(reports_folder, f'summary_report_{now_str}.pdf')
-            c = canvas.Canvas(file_name, pagesize=letter)
-            width, height = letter
-            y = height - 50
-            c.setFont('Helvetica-Bold', 16)
-            c.drawString(50, y, 'Summary Report')
-            c.setFont('Helvetica', 12)
-            y -= 30
-            c.drawString(50, y, f'Date/Time: {now_str}')
-            y -= 30
-            c.drawString(50, y, f'Total Sales: {total_sales}')
-            y -= 20
-            c.drawString(50, y, f'Total Discount: {total_discount}')
-            y -= 20
-            c.drawString(50, y, f'Total Revenue: {total_revenue}')
-            y -= 20
-            c.drawString(50, y, f'Number of Sales: {num_sales}')
-            c.save()
-            messagebox.showinfo('Exported', f'Summary report saved as {file_name}')
+            lines = [
+                f"Total Sales: {summary['total_sales']}",
+                f"Total Discount: {summary['total_discount']}",
+                f"Total Revenue: {summary['total_revenue']}",
+                f"Number of Sales: {summary['num_sales']}"
+            ]
+            def render(job):
+                file_name = pdf_reports.report_file_name('summary_report', now_str)
+                return pdf_reports.render_lines(file_name, 'Summary Report', now_str, lines)
+            now_str = pdf_reports.now_stamp()
+            self.run_pdf_job(render, 'Summary report')
         ttk.Button(dialog, text='Export as PDF', command=export_pdf).pack(pady=10)
         ttk.Button(dialog, text='Close', command=dialog.destroy).pack(pady=5)
         dialog.grab_set()
 
+    def sales_dashboard(self):
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Sales Dashboard')
+        dialog.configure(bg='#f0f4f8')
+        columns = ('Period', 'Sales', 'Revenue', 'Discount', 'Profit', 'Loss')
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=3)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, anchor='center', width=110)
+        tree.pack(fill='both', expand=True, padx=10, pady=10)
+        def show(periods):
+            if not dialog.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for period, totals in periods.items():
+                tree.insert('', 'end', values=(period, totals['num_sales'], totals['total_revenue'], totals['total_discount'],
+                                               totals['profit'], totals['loss']))
+        def load():
+            self.worker.submit(lambda job: dashboard(), on_done=show)
+        btn_frame = ttk.Frame(dialog, style='Inventory.TFrame')
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text='Refresh', command=load, style='Inventory.TButton').pack(side='left', padx=5)
+        ttk.Button(btn_frame, text='Close', command=dialog.destroy, style='Inventory.TButton').pack(side='left', padx=5)
+        load()
+        self.watch_changes(dialog, ('sell_history',), load)
+        dialog.grab_set()
+
     def profit_loss_report(self):
-        history = load_sell_history()
-        conn = sqlite3.connect(LOCALDB_FILE)
-        cursor = conn.cursor()
-        # Map item name to cost price (latest in inventory)
-        cursor.execute('SELECT name, cost_price FROM inventory')
-        cost_price_map = {row[0]: row[1] for row in cursor.fetchall()}
-        conn.close()
         report_dialog = tk.Toplevel(self.root)
         report_dialog.title('Profit/Loss Report')
         report_dialog.configure(bg='#f0f4f8')
-        columns = ('No.', 'Item Name', 'Quantity Sold', 'Cost Price', 'Final Total', 'Profit', 'Loss')
-        # Frame for tree and scrollbars
-        tree_frame = ttk.Frame(report_dialog)
-        tree_frame.pack(fill='both', expand=True, padx=10, pady=10)
-        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, anchor='center', stretch=True, width=120)
-        # Scrollbars
-        xscrollbar = ttk.Scrollbar(tree_frame, orient='horizontal', command=tree.xview)
-        yscrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
-        tree.configure(xscrollcommand=xscrollbar.set, yscrollcommand=yscrollbar.set)
-        tree.grid(row=0, column=0, sticky='nsew')
-        yscrollbar.grid(row=0, column=1, sticky='ns')
-        xscrollbar.grid(row=1, column=0, sticky='ew')
-        tree_frame.rowconfigure(0, weight=1)
-        tree_frame.columnconfigure(0, weight=1)
-        total_profit = 0
-        total_loss = 0
-        for idx, entry in enumerate(history, 1):
-            if isinstance(entry, dict):
-                name = entry.get('name', '')
-                qty = entry.get('quantity_sold', 0) or 0
-                final_total = entry.get('final_total', 0) or 0
-                cost_price = cost_price_map.get(name, 0) or 0
-                try:
-                    qty = float(qty)
-                except Exception:
-                    qty = 0
-                try:
-                    final_total = float(final_total)
-                except Exception:
-                    final_total = 0
-                try:
-                    cost_price = float(cost_price)
-                except Exception:
-                    cost_price = 0
-                cost_total = cost_price * qty
-                profit = 0
-                loss = 0
-                if final_total > cost_total:
-                    profit = final_total - cost_total
-                    total_profit += profit
-                elif final_total < cost_total:
-                    loss = cost_total - final_total
-                    total_loss += loss
-                tree.insert('', 'end', values=(idx, name, qty, cost_price, final_total, profit, loss))
-        total_label = ttk.Label(report_dialog, text=f'Total Profit: {total_profit}    Total Loss: {total_loss}', font=('Segoe UI', 12, 'bold'), background='#f0f4f8')
+        controls = ttk.Frame(report_dialog, style='Inventory.TFrame')
+        controls.pack(fill='x', padx=10, pady=(10, 0))
+        ttk.Label(controls, text='View by:', style='Inventory.TLabel').pack(side='left')
+        view_var = tk.StringVar(value='Sale')
+        view_box = ttk.Combobox(controls, textvariable=view_var, values=['Sale', *GROUPINGS], state='readonly', width=10)
+        view_box.pack(side='left', padx=5)
+        dates = [None, None]
+        # Frame for whichever table the current view uses
+        content = ttk.Frame(report_dialog)
+        content.pack(fill='both', expand=True, padx=10, pady=10)
+        total_label = ttk.Label(report_dialog, font=('Segoe UI', 12, 'bold'), background='#f0f4f8')
+        # Counts calls to show; a load that finishes after a newer one was asked for is dropped
+        shown = [0]
+        def show(event=None):
+            shown[0] += 1
+            request = shown[0]
+            view = view_var.get()
+            date_from, date_to = dates
+            def load(job):
+                # Grouped rows and totals are queries, a round trip each on a server; totals come from the daily rollup
+                rows = profit_by(view, date_from, date_to) if view != 'Sale' else None
+                return rows, profit_totals(date_from, date_to)
+            def loaded(result):
+                if request != shown[0] or not report_dialog.winfo_exists():
+                    return
+                rows, totals = result
+                for widget in content.winfo_children():
+                    widget.destroy()
+                if view == 'Sale':
+                    # Per-sale margins use the cost_price stored with each sale, computed by SQLite page by page
+                    where, params = sell_history_filter(date_from, date_to)
+                    columns = ('No.', 'Item Name', 'Quantity Sold', 'Cost Price', 'Final Total', 'Profit', 'Loss')
+                    source = KeysetSource('sell_history', SALE_PROFIT_COLUMNS, where, params)
+                    VirtualTable(content, columns, source, render=lambda position, row: (position + 1, *row[1:]),
+                                 column_width=120).pack(fill='both', expand=True)
+                else:
+                    columns = (view, 'Quantity Sold', 'Revenue', 'Cost', 'Profit', 'Loss')
+                    tree = ttk.Treeview(content, columns=columns, show='headings', height=15)
+                    for col in columns:
+                        tree.heading(col, text=col)
+                        tree.column(col, anchor='center', stretch=True, width=120)
+                    for row in rows:
+                        tree.insert('', 'end', values=row)
+                    scrollbar = ttk.Scrollbar(content, orient='vertical', command=tree.yview)
+                    tree.configure(yscrollcommand=scrollbar.set)
+                    tree.pack(side='left', fill='both', expand=True)
+                    scrollbar.pack(side='right', fill='y')
+                total_label.config(text=f"Total Profit: {totals['profit']}    Total Loss: {totals['loss']}")
+            self.worker.submit(load, on_done=loaded)
+        def apply_dates(date_from, date_to):
+            dates[:] = [date_from, date_to]
+            show()
+        view_box.bind('<<ComboboxSelected>>', show)
+        self.date_range_bar(report_dialog, apply_dates).pack(fill='x', padx=10, pady=(5, 0), before=content)
         total_label.pack(pady=10)
+        show()
+        self.watch_changes(report_dialog, ('sell_history',), show)
         ttk.Button(report_dialog, text='Close', command=report_dialog.destroy, style='Inventory.TButton').pack(pady=5)
         report_dialog.grab_set()
 
@@ -1305,7 +1407,15 @@ class InventoryApp:
             widget.destroy()
 
 if __name__ == '__main__':
+    services = configure_storage()
     initialize_database()
+    startup.mark('database_ready')
     root = tk.Tk()
     app = InventoryApp(root)
-    root.mainloop() 
\ No newline at end of file
+    # First idle callback runs once the login screen has been drawn
+    root.after_idle(startup.mark, 'login_shown')
+    root.mainloop()
+    for service in services:
+        service.stop()
+    app.worker.shutdown()
+    db.close_all() 
\ No newline at end of file
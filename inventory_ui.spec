@@ -10,7 +10,8 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Nothing imports pandas any more; keep it out of the onefile archive
+    excludes=['pandas'],
     noarchive=False,
     optimize=0,
 )
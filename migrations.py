@@ -0,0 +1,108 @@
+from db import backend, get_connection, transaction
+from rollups import rebuild_daily_customer_sales, rebuild_daily_item_sales
+from users import hash_password, is_password_hash
+
+def add_sell_history_cost_price(conn):
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(sell_history)').fetchall()]
+    if 'cost_price' not in columns:
+        conn.execute('ALTER TABLE sell_history ADD COLUMN cost_price REAL DEFAULT 0')
+
+def add_lookup_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory (name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sell_history_contact_number ON sell_history (contact_number)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sell_history_timestamp ON sell_history (timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sell_history_name ON sell_history (name)')
+
+def add_daily_item_sales(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_item_sales (
+        day TEXT NOT NULL,
+        name TEXT NOT NULL,
+        sales INTEGER NOT NULL DEFAULT 0,
+        quantity REAL NOT NULL DEFAULT 0,
+        total_sale REAL NOT NULL DEFAULT 0,
+        discount REAL NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        cost REAL NOT NULL DEFAULT 0,
+        profit REAL NOT NULL DEFAULT 0,
+        loss REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, name)
+    )''')
+    rebuild_daily_item_sales(conn)
+
+def add_daily_customer_sales(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_customer_sales (
+        day TEXT NOT NULL,
+        customer_name TEXT NOT NULL,
+        contact_number TEXT NOT NULL,
+        sales INTEGER NOT NULL DEFAULT 0,
+        total_sale REAL NOT NULL DEFAULT 0,
+        discount REAL NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, customer_name, contact_number)
+    )''')
+    rebuild_daily_customer_sales(conn)
+
+def add_unique_barcode_index(conn):
+    # Blank barcodes become NULL, which a unique index allows any number of
+    conn.execute("UPDATE inventory SET barcode = NULL WHERE trim(barcode) = ''")
+    # A barcode already shared by several items stays on the oldest one
+    conn.execute('''UPDATE inventory SET barcode = NULL
+        WHERE barcode IS NOT NULL AND id > (SELECT MIN(other.id) FROM inventory AS other WHERE other.barcode = inventory.barcode)''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_barcode ON inventory (barcode)')
+
+def add_sell_history_filter_indexes(conn):
+    # Every row needs a timestamp to have a place in query_sell_history's (timestamp, id) order
+    conn.execute("UPDATE sell_history SET timestamp = '' WHERE timestamp IS NULL")
+    # Each filter column leads an index ending in timestamp, so a filtered page is a seek plus a short range scan;
+    # the single-column name and contact indexes are prefixes of the new ones
+    conn.execute('DROP INDEX IF EXISTS idx_sell_history_name')
+    conn.execute('DROP INDEX IF EXISTS idx_sell_history_contact_number')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sell_history_name_timestamp ON sell_history (name, timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sell_history_contact_timestamp ON sell_history (contact_number, timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sell_history_customer_timestamp ON sell_history (customer_name, timestamp)')
+
+def hash_user_passwords(conn):
+    # Plain-text passwords from the original users table become salted PBKDF2 hashes;
+    # the username UNIQUE constraint already gives logins an index
+    for user_id, password in conn.execute('SELECT id, password FROM users').fetchall():
+        if not is_password_hash(password):
+            conn.execute('UPDATE users SET password = ? WHERE id = ?', (hash_password(password or ''), user_id))
+
+def add_inventory_version(conn):
+    # Bumped by every write to a row, so an edit made from a stale copy can be refused
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(inventory)').fetchall()]
+    if 'version' not in columns:
+        conn.execute('ALTER TABLE inventory ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+# Applied in order; a database at user_version N has had the first N steps run.
+# Append new steps only, never reorder or edit one that has shipped.
+MIGRATIONS = [
+    add_sell_history_cost_price,
+    add_lookup_indexes,
+    add_daily_item_sales,
+    add_daily_customer_sales,
+    add_unique_barcode_index,
+    add_sell_history_filter_indexes,
+    hash_user_passwords,
+    add_inventory_version,
+]
+
+class SchemaOutOfDate(Exception):
+    pass
+
+def schema_version():
+    return backend().schema_version(get_connection())
+
+def migrate():
+    # Each step commits together with its version bump, so an interrupted run resumes cleanly
+    version = schema_version()
+    if backend().name != 'sqlite':
+        # The steps are SQLite DDL; a server database is created at the current version by create_sqlserver_db.py
+        if version < len(MIGRATIONS):
+            raise SchemaOutOfDate(f'Server database is at schema version {version}, this build needs {len(MIGRATIONS)}')
+        return version
+    for number, step in enumerate(MIGRATIONS[version:], version + 1):
+        with transaction() as conn:
+            step(conn)
+            backend().set_schema_version(conn, number)
+    return schema_version()
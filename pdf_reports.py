@@ -0,0 +1,203 @@
+import datetime
+import functools
+import os
+
+TOP_MARGIN = 50
+BOTTOM_MARGIN = 80
+ROW_HEIGHT = 20
+RULE = '-----------------------------'
+
+@functools.lru_cache(maxsize=None)
+def reportlab():
+    # Imported once, on first render; raises ImportError when reportlab is missing
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    return canvas, letter
+
+class TableTemplate:
+    # Title, headers and column positions of one tabular report, laid out once and reused
+    def __init__(self, title, headers, x_positions, rule_end):
+        self.title = title
+        self.headers = headers
+        self.x_positions = x_positions
+        self.rule_end = rule_end
+        self.columns = list(zip(x_positions, headers))
+
+STOCK_TEMPLATE = TableTemplate('Stock Report', ['Name', 'Quantity', 'Price', 'Total Price'], [50, 200, 300, 400], 500)
+SALES_TEMPLATE = TableTemplate('Sales Report',
+                               ['Date/Time', 'Item', 'Qty', 'Price', 'Total', 'Disc(%)', 'Disc Amt', 'Final', 'Cust Name', 'Contact'],
+                               [50, 120, 200, 240, 290, 350, 410, 470, 530, 600], 700)
+CUSTOMER_TEMPLATE = TableTemplate('Customer Report', ['Customer Name', 'Contact', 'Purchases', 'Total Spent'],
+                                  [50, 250, 400, 500], 600)
+
+class PdfDocument:
+    # One canvas with a running y position and page breaks at the bottom margin
+    def __init__(self, file_name):
+        canvas, letter = reportlab()
+        self.file_name = file_name
+        self.canvas = canvas.Canvas(file_name, pagesize=letter)
+        self.height = letter[1]
+        self.y = self.height - TOP_MARGIN
+        self.font = ('Helvetica', 12)
+
+    def set_font(self, name, size):
+        self.font = (name, size)
+        self.canvas.setFont(name, size)
+
+    def new_page(self):
+        self.canvas.showPage()
+        self.canvas.setFont(*self.font)
+        self.y = self.height - TOP_MARGIN
+
+    def ensure_space(self, rows):
+        if self.y - rows * ROW_HEIGHT < BOTTOM_MARGIN - ROW_HEIGHT:
+            self.new_page()
+
+    def title(self, text, now_str):
+        self.set_font('Helvetica-Bold', 16)
+        self.canvas.drawString(50, self.y, text)
+        self.set_font('Helvetica', 12)
+        self.y -= 30
+        self.canvas.drawString(50, self.y, f'Date/Time: {now_str}')
+        self.y -= 30
+
+    def line(self, text, gap=ROW_HEIGHT):
+        self.ensure_space(1)
+        self.canvas.drawString(50, self.y, text)
+        self.y -= gap
+
+    def table_header(self, template):
+        for x, header in template.columns:
+            self.canvas.drawString(x, self.y, header)
+        self.y -= ROW_HEIGHT
+        self.canvas.line(50, self.y, template.rule_end, self.y)
+        self.y -= ROW_HEIGHT
+
+    def table_row(self, template, values):
+        draw = self.canvas.drawString
+        for x, value in zip(template.x_positions, values):
+            draw(x, self.y, str(value))
+        self.y -= ROW_HEIGHT
+        if self.y < BOTTOM_MARGIN:
+            self.new_page()
+
+    def save(self):
+        self.canvas.save()
+        return self.file_name
+
+def report_file_name(prefix, now_str):
+    reports_folder = 'reports'
+    if not os.path.exists(reports_folder):
+        os.makedirs(reports_folder)
+    return os.path.join(reports_folder, f'{prefix}_{now_str}.pdf')
+
+def now_stamp():
+    return datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+
+def render_table(file_name, template, now_str, rows, job=None, total_rows=None, footer=None):
+    # rows may be any iterable of value sequences; pass total_rows for determinate progress
+    doc = PdfDocument(file_name)
+    doc.title(template.title, now_str)
+    doc.table_header(template)
+    for done, values in enumerate(rows, 1):
+        if job:
+            job.progress(done, total_rows)
+        doc.table_row(template, values)
+    if footer:
+        doc.y -= 10
+        doc.set_font('Helvetica-Bold', 12)
+        doc.line(footer)
+    return doc.save()
+
+def render_lines(file_name, title, now_str, lines):
+    doc = PdfDocument(file_name)
+    doc.title(title, now_str)
+    for text in lines:
+        doc.line(text)
+    return doc.save()
+
+# Bills: a bill is {'timestamp', 'customer_name', 'contact_number', 'lines'}, lines as priced by checkout.cart_line
+
+def bill_line_texts(line):
+    return [
+        f"Item: {line['name']}",
+        f"Quantity: {line['quantity']}",
+        f"Price per item: {line['price']}",
+        f"Total: {line['total_sale']}",
+        f"Discount: {line['discount_percent']}%",
+        f"Discount Price: {line['discount']}",
+        f"Final Total: {line['final_total']}"
+    ]
+
+def bill_text(bill):
+    # Plain-text form shown in the bill dialog
+    lines = bill['lines']
+    parts = [f"BILL\nDate/Time: {bill['timestamp']}\n{RULE}\nCustomer Name: {bill['customer_name']}\n"
+             f"Contact Number: {bill['contact_number']}\n{RULE}\n"]
+    parts.append(f'{RULE}\n'.join('\n'.join(bill_line_texts(line)) + '\n' for line in lines))
+    if len(lines) > 1:
+        parts.append(f"{RULE}\nGrand Total: {sum(line['final_total'] or 0 for line in lines)}\n")
+    parts.append(f'{RULE}\nThank you for your purchase!')
+    return ''.join(parts)
+
+def bill_file_name(bill):
+    # billing/<month_name>/<date>/bill_<contact>_<datetime>.pdf
+    timestamp = bill['timestamp']
+    try:
+        bill_dt = datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+    except Exception:
+        bill_dt = datetime.datetime.now()
+    billing_folder = os.path.join('billing', bill_dt.strftime('%B'), bill_dt.strftime('%Y-%m-%d'))
+    if not os.path.exists(billing_folder):
+        os.makedirs(billing_folder)
+    safe_contact = str(bill['contact_number']).replace(' ', '').replace('/', '').replace('\\', '')
+    safe_datetime = timestamp.replace(':', '').replace(' ', '_').replace('-', '')
+    return os.path.join(billing_folder, f'bill_{safe_contact}_{safe_datetime}.pdf')
+
+def render_bill(bill, file_name=None):
+    doc = PdfDocument(file_name or bill_file_name(bill))
+    doc.set_font('Helvetica-Bold', 16)
+    doc.line('BILL', gap=30)
+    doc.set_font('Helvetica', 12)
+    doc.line(f"Date/Time: {bill['timestamp']}")
+    doc.line(RULE)
+    doc.line(f"Customer Name: {bill['customer_name']}")
+    doc.line(f"Contact Number: {bill['contact_number']}")
+    doc.line(RULE)
+    for line in bill['lines']:
+        # Keep each item's block on one page
+        doc.ensure_space(8)
+        for text in bill_line_texts(line):
+            doc.line(text)
+        doc.line(RULE)
+    if len(bill['lines']) > 1:
+        doc.line(f"Grand Total: {sum(line['final_total'] or 0 for line in bill['lines'])}")
+    doc.y -= 10
+    doc.line('Thank you for your purchase!')
+    return doc.save()
+
+def render_bills(bills, job=None):
+    # Batch mode: reportlab is loaded once and every bill reuses the same layout
+    file_names = []
+    for done, bill in enumerate(bills, 1):
+        if job:
+            job.progress(done, len(bills))
+        file_names.append(render_bill(bill))
+    return file_names
+
+def bills_from_history(entries):
+    # One checkout writes all its rows with the same timestamp and customer, so those rows form one bill
+    bills = {}
+    for entry in entries:
+        key = (entry.timestamp, entry.customer_name, entry.contact_number)
+        bill = bills.setdefault(key, {'timestamp': key[0], 'customer_name': key[1], 'contact_number': key[2], 'lines': []})
+        bill['lines'].append({
+            'name': entry.name,
+            'quantity': entry.quantity_sold,
+            'price': entry.price,
+            'total_sale': entry.total_sale,
+            'discount_percent': entry.discount_percent,
+            'discount': entry.discount_price,
+            'final_total': entry.final_total
+        })
+    return list(bills.values())
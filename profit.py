@@ -0,0 +1,39 @@
+from db import backend, get_connection
+
+# Per-sale cost, revenue, profit and loss, from the cost_price recorded when the sale was made
+SALE_COST = 'COALESCE(cost_price, 0) * COALESCE(quantity_sold, 0)'
+SALE_REVENUE = 'COALESCE(final_total, 0)'
+SALE_PROFIT = f'CASE WHEN {SALE_REVENUE} > {SALE_COST} THEN {SALE_REVENUE} - {SALE_COST} ELSE 0 END'
+SALE_LOSS = f'CASE WHEN {SALE_COST} > {SALE_REVENUE} THEN {SALE_COST} - {SALE_REVENUE} ELSE 0 END'
+# Keyset-pageable per-sale rows: id, name, quantity, unit cost, revenue, profit, loss
+SALE_PROFIT_COLUMNS = f'id, name, quantity_sold, COALESCE(cost_price, 0), {SALE_REVENUE}, {SALE_PROFIT}, {SALE_LOSS}'
+
+# daily_item_sales column each grouping reads its key from; {substr} is the backend's substring function
+GROUPINGS = {'Item': 'name', 'Day': 'day', 'Month': '{substr}(day, 1, 7)'}
+
+def day_range(date_from=None, date_to=None):
+    # WHERE clause over a rollup's day column; both ends inclusive YYYY-MM-DD
+    conditions = []
+    params = []
+    if date_from:
+        conditions.append('day >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append('day <= ?')
+        params.append(date_to)
+    return (f" WHERE {' AND '.join(conditions)}" if conditions else ''), tuple(params)
+
+def profit_totals(date_from=None, date_to=None):
+    where_sql, params = day_range(date_from, date_to)
+    row = get_connection().execute(
+        f'''SELECT COALESCE(SUM(revenue), 0), COALESCE(SUM(cost), 0), COALESCE(SUM(profit), 0), COALESCE(SUM(loss), 0)
+            FROM daily_item_sales{where_sql}''', params).fetchone()
+    return {'revenue': row[0], 'cost': row[1], 'profit': row[2], 'loss': row[3]}
+
+def profit_by(grouping, date_from=None, date_to=None):
+    # One row per item, day or month: key, quantity, revenue, cost, profit, loss
+    key = GROUPINGS[grouping].format(substr=backend().substr)
+    where_sql, params = day_range(date_from, date_to)
+    return get_connection().execute(
+        f'''SELECT {key}, SUM(quantity), SUM(revenue), SUM(cost), SUM(profit), SUM(loss)
+            FROM daily_item_sales{where_sql} GROUP BY {key} ORDER BY 1''', params).fetchall()
@@ -0,0 +1,16 @@
+import os
+
+import db
+from migrations import migrate
+from rollups import rebuild_rollups
+from storage import configure_backend, load_storage_config
+
+# Works against whichever database config/storage.json points at
+configure_backend(load_storage_config())
+if db.backend().name == 'sqlite' and not os.path.exists(db.backend().file_name):
+    print(f'{db.backend().file_name} does not exist.')
+else:
+    # Regenerates daily_item_sales and daily_customer_sales from sell_history
+    migrate()
+    rebuild_rollups()
+    print('Rebuilt sales rollups from sell_history.')
@@ -0,0 +1,285 @@
+import datetime
+from collections import namedtuple
+
+from db import backend, get_connection, notify_change, retry_busy, transaction
+from rollups import add_sales_to_rollups, move_customer_sales
+
+USER_COLUMNS = 'id, username, role'
+INVENTORY_COLUMNS = 'id, name, quantity, price, barcode, cost_price, version'
+SELL_HISTORY_COLUMNS = ('id, name, quantity_sold, price, total_sale, discount, discount_percent, discount_price, '
+                        'final_total, timestamp, customer_name, contact_number, cost_price')
+# Rows per query_sell_history page unless the caller asks otherwise
+HISTORY_PAGE_ROWS = 200
+# Sort key -> direction over (timestamp, id); the id breaks ties so every row has one place in the order
+SELL_HISTORY_SORTS = {'newest': 'DESC', 'oldest': 'ASC'}
+
+# Rows are read-only tuples with named fields: a few pointers each instead of a per-row dict
+User = namedtuple('User', USER_COLUMNS)
+InventoryItem = namedtuple('InventoryItem', INVENTORY_COLUMNS)
+SaleRecord = namedtuple('SaleRecord', SELL_HISTORY_COLUMNS)
+
+def load_users():
+    # Password hashes stay in the database; only find_user_credentials reads one
+    cursor = get_connection().execute(f'SELECT {USER_COLUMNS} FROM users ORDER BY id')
+    return list(map(User._make, cursor))
+
+def find_user_credentials(username):
+    # (User, password hash) through the unique username index, or None
+    row = get_connection().execute(f'SELECT {USER_COLUMNS}, password FROM users WHERE username = ?', (username,)).fetchone()
+    return (User._make(row[:-1]), row[-1]) if row else None
+
+class DuplicateUsername(Exception):
+    def __init__(self, username):
+        super().__init__(f"Username '{username}' already exists")
+        self.username = username
+
+@retry_busy
+def insert_user(username, password_hash, role):
+    # users.id is not an identity column on the server, so the next id is taken under the write lock
+    try:
+        with transaction(immediate=True) as conn:
+            if conn.execute('SELECT 1 FROM users WHERE username = ?', (username,)).fetchone():
+                raise DuplicateUsername(username)
+            user_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM users').fetchone()[0]
+            conn.execute('INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)',
+                         (user_id, username, password_hash, role))
+            notify_change('users', [user_id])
+    except backend().integrity_errors as e:
+        raise DuplicateUsername(username) from e
+    return user_id
+
+@retry_busy
+def update_user(user_id, role, password_hash=None):
+    # password_hash None keeps the current password
+    with transaction() as conn:
+        conn.execute('UPDATE users SET role = ?, password = COALESCE(?, password) WHERE id = ?',
+                     (role, password_hash, user_id))
+        notify_change('users', [user_id])
+
+@retry_busy
+def set_user_password(user_id, password_hash):
+    with transaction() as conn:
+        conn.execute('UPDATE users SET password = ? WHERE id = ?', (password_hash, user_id))
+        notify_change('users', [user_id])
+
+@retry_busy
+def delete_user(user_id):
+    with transaction() as conn:
+        conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        notify_change('users', [user_id])
+
+def load_inventory():
+    # Id order, so the list keeps its order across reloads; a server gives no order without ORDER BY
+    cursor = get_connection().execute(f'SELECT {INVENTORY_COLUMNS} FROM inventory ORDER BY id')
+    return list(map(InventoryItem._make, cursor))
+
+def load_inventory_items(item_ids):
+    # Rows that no longer exist are simply absent from the result
+    item_ids = list(item_ids)
+    placeholders = ', '.join('?' * len(item_ids))
+    cursor = get_connection().execute(f'SELECT {INVENTORY_COLUMNS} FROM inventory WHERE id IN ({placeholders})', item_ids)
+    return list(map(InventoryItem._make, cursor))
+
+class DuplicateBarcode(Exception):
+    def __init__(self, barcode):
+        super().__init__(f'Barcode {barcode} is already used by another item')
+        self.barcode = barcode
+
+class StaleItem(Exception):
+    def __init__(self, item_name):
+        super().__init__(f'{item_name} was changed or deleted on another till after it was loaded here')
+        self.item_name = item_name
+
+def _barcode_or_none(barcode):
+    # Blank barcodes are stored as NULL so the unique index allows any number of them
+    return (barcode or '').strip() or None
+
+@retry_busy
+def add_inventory_item(name, quantity, price, cost_price, barcode=None):
+    barcode = _barcode_or_none(barcode)
+    try:
+        with transaction() as conn:
+            item_id = backend().insert(conn, 'INSERT INTO inventory (name, quantity, price, barcode, cost_price) VALUES (?, ?, ?, ?, ?)',
+                                       (name, quantity, price, barcode, cost_price))
+            notify_change('inventory', [item_id])
+    except backend().integrity_errors as e:
+        raise DuplicateBarcode(barcode) from e
+    return item_id
+
+@retry_busy
+def update_inventory_item(item_id, name, quantity, price, cost_price, barcode=None, version=None):
+    # With version, the row is only written if nothing else has written it since that version was read
+    barcode = _barcode_or_none(barcode)
+    version_sql, version_params = _version_check(version)
+    try:
+        with transaction() as conn:
+            cursor = conn.execute(f'''UPDATE inventory SET name=?, quantity=?, price=?, cost_price=?, barcode=?,
+                                      version = version + 1 WHERE id=?{version_sql}''',
+                                  (name, quantity, price, cost_price, barcode, item_id, *version_params))
+            if cursor.rowcount == 0:
+                raise StaleItem(name)
+            notify_change('inventory', [item_id])
+    except backend().integrity_errors as e:
+        raise DuplicateBarcode(barcode) from e
+
+def _version_check(version):
+    return (' AND version=?', (version,)) if version is not None else ('', ())
+
+def find_item_by_barcode(barcode):
+    # Served by the unique barcode index
+    row = get_connection().execute(f'SELECT {INVENTORY_COLUMNS} FROM inventory WHERE barcode = ?',
+                                   (barcode.strip(),)).fetchone()
+    return InventoryItem._make(row) if row else None
+
+@retry_busy
+def delete_inventory_item(item_id, version=None, name=None):
+    version_sql, version_params = _version_check(version)
+    with transaction() as conn:
+        if conn.execute(f'DELETE FROM inventory WHERE id=?{version_sql}', (item_id, *version_params)).rowcount == 0:
+            raise StaleItem(name or f'Item {item_id}')
+        notify_change('inventory', [item_id])
+
+def load_sell_history(**filters):
+    # filters are those of sell_history_filter; without any, the whole table
+    where, params = sell_history_filter(**filters)
+    return list(map(SaleRecord._make, iter_rows('sell_history', SELL_HISTORY_COLUMNS, where, params)))
+
+def count_rows(table, where='', params=()):
+    where_sql = f' WHERE {where}' if where else ''
+    return get_connection().execute(f'SELECT COUNT(*) FROM {table}{where_sql}', params).fetchone()[0]
+
+def _where_after(where, params, after_id):
+    conditions = [where] if where else []
+    if after_id is not None:
+        conditions.append('id > ?')
+        params = (*params, after_id)
+    where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where_sql, params
+
+def key_at_offset(table, offset, after_id=None, where='', params=()):
+    # Id of the row offset places past after_id, used to seek before keyset paging
+    where_sql, params = _where_after(where, params, after_id)
+    page_sql, page_params = backend().page(1, offset)
+    row = get_connection().execute(f'SELECT id FROM {table}{where_sql} ORDER BY id {page_sql}',
+                                   (*params, *page_params)).fetchone()
+    return row[0] if row else None
+
+def fetch_page(table, columns, after_id, limit, where='', params=()):
+    # Keyset paging on id: rows with id > after_id, at most limit of them
+    where_sql, params = _where_after(where, params, after_id)
+    page_sql, page_params = backend().page(limit)
+    return get_connection().execute(f'SELECT {columns} FROM {table}{where_sql} ORDER BY id {page_sql}',
+                                    (*params, *page_params)).fetchall()
+
+def iter_rows(table, columns, where='', params=()):
+    # Lazily iterated cursor, for totals that should not hold every row at once
+    where_sql = f' WHERE {where}' if where else ''
+    return get_connection().execute(f'SELECT {columns} FROM {table}{where_sql} ORDER BY id', params)
+
+def sell_history_filter(date_from=None, date_to=None, customer_name=None, contact_number=None, item_name=None):
+    # WHERE clause and params for sell_history; dates are inclusive YYYY-MM-DD, timestamps 'YYYY-MM-DD HH:MM:SS' text
+    conditions = []
+    params = []
+    if date_from:
+        conditions.append('timestamp >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append('timestamp < ?')
+        params.append((datetime.date.fromisoformat(date_to) + datetime.timedelta(days=1)).isoformat())
+    if customer_name:
+        conditions.append('customer_name = ?')
+        params.append(customer_name)
+    if contact_number:
+        conditions.append('contact_number = ?')
+        params.append(contact_number)
+    if item_name:
+        conditions.append('name = ?')
+        params.append(item_name)
+    return ' AND '.join(conditions), tuple(params)
+
+def _sell_history_after(cursor, sort, filters):
+    # WHERE and ORDER BY for rows past cursor in sort order; each filter column has a (column, timestamp) index
+    where, params = sell_history_filter(**filters)
+    direction = SELL_HISTORY_SORTS[sort]
+    conditions = [where] if where else []
+    if cursor is not None:
+        timestamp, last_id = cursor
+        before, after = ('<=', '<') if direction == 'DESC' else ('>=', '>')
+        # The first condition is a plain range the index can seek on; the second drops the cursor row and its ties
+        conditions.append(f'timestamp {before} ? AND (timestamp {after} ? OR id {after} ?)')
+        params = (*params, timestamp, timestamp, last_id)
+    where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where_sql, params, f'ORDER BY timestamp {direction}, id {direction}'
+
+def sell_history_cursor(record):
+    return (record.timestamp, record.id)
+
+def query_sell_history(cursor=None, limit=HISTORY_PAGE_ROWS, sort='newest', **filters):
+    # One page of SaleRecords after cursor (None for the first page), and the cursor of the next page or None
+    where_sql, params, order_sql = _sell_history_after(cursor, sort, filters)
+    page_sql, page_params = backend().page(limit + 1)
+    rows = get_connection().execute(f'SELECT {SELL_HISTORY_COLUMNS} FROM sell_history{where_sql} {order_sql} {page_sql}',
+                                    (*params, *page_params)).fetchall()
+    records = list(map(SaleRecord._make, rows[:limit]))
+    return records, (sell_history_cursor(records[-1]) if len(rows) > limit else None)
+
+def sell_history_cursor_at(offset, cursor=None, sort='newest', **filters):
+    # Cursor of the row offset places past cursor, for jumping into the middle of the order
+    where_sql, params, order_sql = _sell_history_after(cursor, sort, filters)
+    page_sql, page_params = backend().page(1, offset)
+    row = get_connection().execute(f'SELECT timestamp, id FROM sell_history{where_sql} {order_sql} {page_sql}',
+                                   (*params, *page_params)).fetchone()
+    return tuple(row) if row else None
+
+def iter_sell_history(sort='oldest', **filters):
+    # Every matching SaleRecord, read a page at a time
+    cursor = None
+    while True:
+        records, cursor = query_sell_history(cursor, sort=sort, **filters)
+        yield from records
+        if cursor is None:
+            return
+
+class OutOfStock(Exception):
+    def __init__(self, item_name):
+        super().__init__(f'Not enough {item_name} in stock')
+        self.item_name = item_name
+
+@retry_busy
+def record_sales(lines, timestamp, customer_name, contact_number):
+    # Every line's stock decrement and history row commit together, or none do
+    with transaction(immediate=True) as conn:
+        for line in lines:
+            # Relative and guarded, so concurrent tills never overwrite each other's decrements or oversell
+            cursor = conn.execute('UPDATE inventory SET quantity = quantity - ?, version = version + 1 WHERE id = ? AND quantity >= ?',
+                                  (line['quantity'], line['item_id'], line['quantity']))
+            if cursor.rowcount == 0:
+                raise OutOfStock(line['name'])
+        conn.executemany('''INSERT INTO sell_history (
+            name, quantity_sold, price, total_sale, discount_percent, discount_price, final_total, timestamp, customer_name, contact_number, cost_price
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            [(line['name'], line['quantity'], line['price'], line['total_sale'], line['discount_percent'], line['discount'],
+              line['final_total'], timestamp, customer_name, contact_number, line['cost_price']) for line in lines])
+        add_sales_to_rollups(conn, lines, timestamp, customer_name, contact_number)
+        notify_change('inventory', {line['item_id'] for line in lines})
+        notify_change('sell_history')
+
+@retry_busy
+def rename_customer(old_name, old_contact, new_name, new_contact):
+    # One set-based UPDATE over the customer's sales, found through the contact index; returns rows changed
+    with transaction(immediate=True) as conn:
+        changed = conn.execute('''UPDATE sell_history SET customer_name = ?, contact_number = ?
+                                  WHERE contact_number = ? AND COALESCE(customer_name, '') = ?''',
+                               (new_name, new_contact, old_contact, old_name)).rowcount
+        if changed and (old_name, old_contact) != (new_name, new_contact):
+            move_customer_sales(conn, old_name, old_contact, new_name, new_contact)
+            notify_change('sell_history')
+    return changed
+
+def get_customer_name_by_contact(contact_number):
+    # Most recent entry for this contact number
+    page_sql, page_params = backend().page(1)
+    row = get_connection().execute(
+        f'SELECT customer_name FROM sell_history WHERE contact_number = ? ORDER BY id DESC {page_sql}',
+        (contact_number, *page_params)).fetchone()
+    return (row[0] or '') if row else ''
@@ -0,0 +1,88 @@
+import datetime
+
+from db import backend, get_connection, retry_busy, transaction
+from profit import SALE_COST, SALE_LOSS, SALE_PROFIT, SALE_REVENUE, day_range
+
+# Per day x item and per day x customer totals, kept in step with sell_history by
+# add_sales_to_rollups in each sale's transaction. rebuild_rollups regenerates both.
+ITEM_TOTALS = ['sales', 'quantity', 'total_sale', 'discount', 'revenue', 'cost', 'profit', 'loss']
+CUSTOMER_TOTALS = ['sales', 'total_sale', 'discount', 'revenue']
+
+def rebuild_daily_item_sales(conn):
+    day = f"{backend().substr}(COALESCE(timestamp, ''), 1, 10)"
+    conn.execute('DELETE FROM daily_item_sales')
+    conn.execute(f'''INSERT INTO daily_item_sales (day, name, sales, quantity, total_sale, discount, revenue, cost, profit, loss)
+        SELECT {day}, COALESCE(name, ''), COUNT(*), COALESCE(SUM(quantity_sold), 0), COALESCE(SUM(total_sale), 0),
+               COALESCE(SUM(discount_price), 0), SUM({SALE_REVENUE}), SUM({SALE_COST}), SUM({SALE_PROFIT}), SUM({SALE_LOSS})
+        FROM sell_history GROUP BY {day}, COALESCE(name, '')''')
+
+def rebuild_daily_customer_sales(conn):
+    day = f"{backend().substr}(COALESCE(timestamp, ''), 1, 10)"
+    conn.execute('DELETE FROM daily_customer_sales')
+    conn.execute(f'''INSERT INTO daily_customer_sales (day, customer_name, contact_number, sales, total_sale, discount, revenue)
+        SELECT {day}, COALESCE(customer_name, ''), COALESCE(contact_number, ''), COUNT(*),
+               COALESCE(SUM(total_sale), 0), COALESCE(SUM(discount_price), 0), SUM({SALE_REVENUE})
+        FROM sell_history GROUP BY {day}, COALESCE(customer_name, ''), COALESCE(contact_number, '')''')
+
+@retry_busy
+def rebuild_rollups():
+    with transaction(immediate=True) as conn:
+        rebuild_daily_item_sales(conn)
+        rebuild_daily_customer_sales(conn)
+
+def add_sales_to_rollups(conn, lines, timestamp, customer_name, contact_number):
+    # Called inside the sale's own transaction so the rollups never drift from sell_history
+    day = timestamp[:10]
+    rows = []
+    for line in lines:
+        cost = (line['cost_price'] or 0) * line['quantity']
+        revenue = line['final_total']
+        rows.append((day, line['name'], 1, line['quantity'], line['total_sale'], line['discount'], revenue, cost,
+                     max(revenue - cost, 0), max(cost - revenue, 0)))
+    backend().add_totals(conn, 'daily_item_sales', ['day', 'name'], ITEM_TOTALS, rows)
+    backend().add_totals(conn, 'daily_customer_sales', ['day', 'customer_name', 'contact_number'], CUSTOMER_TOTALS,
+                         [(day, customer_name, contact_number, len(lines), sum(line['total_sale'] for line in lines),
+                           sum(line['discount'] for line in lines), sum(line['final_total'] for line in lines))])
+
+def move_customer_sales(conn, old_name, old_contact, new_name, new_contact):
+    # A renamed customer's days are added onto any the new name and contact already have
+    rows = conn.execute('''SELECT day, sales, total_sale, discount, revenue FROM daily_customer_sales
+                           WHERE customer_name = ? AND contact_number = ?''', (old_name, old_contact)).fetchall()
+    conn.execute('DELETE FROM daily_customer_sales WHERE customer_name = ? AND contact_number = ?', (old_name, old_contact))
+    backend().add_totals(conn, 'daily_customer_sales', ['day', 'customer_name', 'contact_number'], CUSTOMER_TOTALS,
+                         [(row[0], new_name, new_contact, *row[1:]) for row in rows])
+
+def period_totals(date_from=None, date_to=None):
+    where_sql, params = day_range(date_from, date_to)
+    row = get_connection().execute(
+        f'''SELECT COALESCE(SUM(sales), 0), COALESCE(SUM(total_sale), 0), COALESCE(SUM(discount), 0),
+                   COALESCE(SUM(revenue), 0), COALESCE(SUM(cost), 0), COALESCE(SUM(profit), 0), COALESCE(SUM(loss), 0)
+            FROM daily_item_sales{where_sql}''', params).fetchone()
+    return {
+        'num_sales': int(row[0]),
+        'total_sales': row[1],
+        'total_discount': row[2],
+        'total_revenue': row[3],
+        'cost': row[4],
+        'profit': row[5],
+        'loss': row[6]
+    }
+
+def customer_period_totals(date_from=None, date_to=None):
+    where_sql, params = day_range(date_from, date_to)
+    cursor = get_connection().execute(
+        f'''SELECT customer_name, contact_number, SUM(sales), SUM(revenue) FROM daily_customer_sales{where_sql}
+            GROUP BY customer_name, contact_number ORDER BY MIN(day), customer_name''', params)
+    return [
+        {'customer_name': row[0], 'contact_number': row[1], 'purchases': int(row[2]), 'spent': row[3]}
+        for row in cursor.fetchall()
+    ]
+
+def dashboard(today=None):
+    # Today, month-to-date and year-to-date; each is a range scan over a few hundred rollup rows
+    today = today or datetime.date.today()
+    return {
+        'Today': period_totals(today.isoformat(), today.isoformat()),
+        'Month to date': period_totals(today.replace(day=1).isoformat(), today.isoformat()),
+        'Year to date': period_totals(today.replace(month=1, day=1).isoformat(), today.isoformat())
+    }
@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+NGRAM_SIZE = 3
+
+def search_key(item):
+    # Name and barcode are kept apart so no n-gram spans both
+    return f"{item.name}\n{item.barcode or ''}".lower()
+
+def ngrams(text):
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+class InventorySearch:
+    def __init__(self, items=()):
+        self.keys = {}
+        self.positions = {}
+        self.index = defaultdict(set)
+        self.next_position = 0
+        self.last_query = None
+        self.last_result = None
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        item_id = item.id
+        if item_id in self.keys:
+            self.remove(item_id, keep_position=True)
+        if item_id not in self.positions:
+            self.positions[item_id] = self.next_position
+            self.next_position += 1
+        key = search_key(item)
+        self.keys[item_id] = key
+        for gram in ngrams(key):
+            self.index[gram].add(item_id)
+        self.last_query = None
+
+    def remove(self, item_id, keep_position=False):
+        key = self.keys.pop(item_id, None)
+        if key is None:
+            return
+        for gram in ngrams(key):
+            ids = self.index[gram]
+            ids.discard(item_id)
+            if not ids:
+                del self.index[gram]
+        if not keep_position:
+            del self.positions[item_id]
+        self.last_query = None
+
+    def matches(self, item, query):
+        return not query or query in search_key(item)
+
+    def search(self, query):
+        # Returns matching ids in inventory order, or None when the query is empty
+        query = query.strip().lower()
+        if not query:
+            self.last_query = None
+            return None
+        if self.last_query and self.last_query in query:
+            # A longer query can only narrow the previous result
+            result = [item_id for item_id in self.last_result if query in self.keys[item_id]]
+        else:
+            grams = ngrams(query)
+            if grams:
+                postings = sorted((self.index.get(gram, set()) for gram in grams), key=len)
+                candidates = postings[0].intersection(*postings[1:])
+            else:
+                candidates = self.keys
+            result = sorted((item_id for item_id in candidates if query in self.keys[item_id]),
+                            key=self.positions.__getitem__)
+        self.last_query = query
+        self.last_result = result
+        return result
@@ -0,0 +1,29 @@
+import datetime
+import os
+import time
+
+from db import CONFIG_DIR
+
+# One line per start, so regressions show up when runs are compared
+STARTUP_REPORT_FILE = os.path.join(CONFIG_DIR, 'startup_profile.csv')
+STARTUP_PHASES = ('imports', 'database_ready', 'login_shown', 'inventory_loaded')
+
+_started = time.perf_counter()
+_marks = {}
+
+def mark(phase):
+    # Milliseconds since this module was imported, which inventory_ui does first.
+    # The report is written once every phase has been reached, in whatever order.
+    if phase in _marks:
+        return
+    _marks[phase] = (time.perf_counter() - _started) * 1000
+    if all(name in _marks for name in STARTUP_PHASES):
+        write_report()
+
+def write_report():
+    new_file = not os.path.exists(STARTUP_REPORT_FILE)
+    with open(STARTUP_REPORT_FILE, 'a') as f:
+        if new_file:
+            f.write('started,' + ','.join(f'{phase}_ms' for phase in STARTUP_PHASES) + '\n')
+        started = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        f.write(started + ',' + ','.join(f'{_marks[phase]:.1f}' for phase in STARTUP_PHASES) + '\n')
@@ -0,0 +1,201 @@
+import csv
+import math
+import os
+
+from db import get_connection, notify_change, retry_busy, transaction
+
+# Rows validated and written per transaction
+IMPORT_CHUNK_ROWS = 5000
+IMPORT_FORMATS = {'Excel': '.xlsx', 'CSV': '.csv'}
+REQUIRED_COLUMNS = ('name', 'quantity', 'price')
+OPTIONAL_COLUMNS = ('cost_price', 'barcode')
+# Largest quantity an SQLite INTEGER holds
+MAX_QUANTITY = 2 ** 63 - 1
+
+class InvalidImportFile(Exception):
+    pass
+
+def read_csv(file_name):
+    # Yields (headers, estimated row count) first, then each data row
+    with open(file_name, newline='', encoding='utf-8-sig') as f:
+        total = max(sum(1 for _ in f) - 1, 0)
+        f.seek(0)
+        reader = csv.reader(f)
+        yield next(reader, []), total
+        yield from reader
+
+def read_xlsx(file_name):
+    from openpyxl import load_workbook
+    # Read-only mode streams the first sheet instead of loading it whole
+    workbook = load_workbook(file_name, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        yield next(rows, ()), max((workbook.active.max_row or 1) - 1, 0)
+        yield from rows
+    finally:
+        workbook.close()
+
+READERS = {'.csv': read_csv, '.xlsx': read_xlsx}
+
+def column_key(header):
+    return str(header or '').strip().lower().replace(' ', '_')
+
+def text(value):
+    # Spreadsheets hand back whole numbers as floats; a barcode of 123.0 means '123'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value is not None else ''
+
+def parse_row(values, positions):
+    # Returns (name, quantity, price, cost_price, barcode), cost_price and barcode None when not given
+    def field(column):
+        position = positions.get(column)
+        return text(values[position]) if position is not None and position < len(values) else ''
+    name = field('name')
+    if not name:
+        raise ValueError('Name is empty')
+    try:
+        quantity = float(field('quantity'))
+        price = float(field('price'))
+        cost_price = float(field('cost_price')) if field('cost_price') else None
+    except ValueError:
+        raise ValueError('Quantity, price and cost price must be numbers') from None
+    # float() also accepts nan and inf, which would be stored as NULL or break every total
+    if not all(math.isfinite(value) for value in (quantity, price, cost_price or 0)):
+        raise ValueError('Quantity, price and cost price must be finite numbers')
+    if not quantity.is_integer():
+        raise ValueError('Quantity must be a whole number')
+    if quantity > MAX_QUANTITY:
+        raise ValueError('Quantity is too large')
+    if quantity < 0 or price < 0 or (cost_price or 0) < 0:
+        raise ValueError('Quantity and prices cannot be negative')
+    return name, int(quantity), price, cost_price, field('barcode') or None
+
+class InventoryImport:
+    # Matches file rows to inventory by barcode, then by name; an unmatched row becomes a new item.
+    # A name match never replaces a barcode: same name with a different barcode is a separate item.
+    # Rows naming the same item are merged, so each item is written once per chunk.
+    def __init__(self, add_quantity=True):
+        self.add_quantity = add_quantity
+        self.by_barcode = {}
+        self.barcodes = {}
+        self.by_name = {}
+        for item_id, name, barcode in get_connection().execute('SELECT id, name, barcode FROM inventory ORDER BY id'):
+            self.by_name.setdefault(name, item_id)
+            if barcode:
+                self.remember_barcode(item_id, barcode)
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = []
+
+    def remember_barcode(self, item_id, barcode):
+        old = self.barcodes.get(item_id)
+        if old and old != barcode:
+            self.by_barcode.pop(old, None)
+        self.barcodes[item_id] = barcode
+        self.by_barcode[barcode] = item_id
+
+    def merge(self, pending, row):
+        if pending is None:
+            return list(row)
+        name, quantity, price, cost_price, barcode = row
+        # A later row wins on price, cost price and barcode; quantities add up when restocking
+        pending[1] = pending[1] + quantity if self.add_quantity else quantity
+        pending[2] = price
+        pending[3] = cost_price if cost_price is not None else pending[3]
+        pending[4] = barcode or pending[4]
+        return pending
+
+    @retry_busy
+    def write_chunk(self, rows):
+        # rows are parsed rows; existing items are updated and new ones inserted in one transaction
+        updates = {}
+        inserts = []
+        new_by_barcode = {}
+        new_by_name = {}
+        for row in rows:
+            name, barcode = row[0], row[4]
+            if barcode and barcode in self.by_barcode:
+                item_id = self.by_barcode[barcode]
+            elif barcode and barcode in new_by_barcode:
+                item_id = None
+                position = new_by_barcode[barcode]
+            else:
+                item_id = self.by_name.get(name)
+                if item_id is not None and barcode and self.barcodes.get(item_id) not in (None, barcode):
+                    item_id = None
+                position = new_by_name.get(name)
+                if item_id is None and position is not None and barcode and inserts[position][4] not in (None, barcode):
+                    # Same name, different barcode: a separate new item
+                    position = None
+            if item_id is not None:
+                updates[item_id] = self.merge(updates.get(item_id), row)
+                if barcode:
+                    self.remember_barcode(item_id, barcode)
+                continue
+            if position is None:
+                position = len(inserts)
+                inserts.append(None)
+            inserts[position] = self.merge(inserts[position], row)
+            new_by_name.setdefault(name, position)
+            if barcode:
+                new_by_barcode[barcode] = position
+        quantity_sql = 'quantity + ?' if self.add_quantity else '?'
+        with transaction(immediate=True) as conn:
+            conn.executemany(f'''UPDATE inventory SET quantity = {quantity_sql}, price = ?, cost_price = COALESCE(?, cost_price),
+                                 barcode = COALESCE(?, barcode), version = version + 1 WHERE id = ?''',
+                             [(quantity, price, cost_price, barcode, item_id)
+                              for item_id, (name, quantity, price, cost_price, barcode) in updates.items()])
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM inventory').fetchone()[0]
+            conn.executemany('INSERT INTO inventory (name, quantity, price, barcode, cost_price) VALUES (?, ?, ?, ?, ?)',
+                             [(name, quantity, price, barcode, cost_price or 0)
+                              for name, quantity, price, cost_price, barcode in inserts])
+            new_items = conn.execute('SELECT id, name, barcode FROM inventory WHERE id > ? ORDER BY id', (last_id,)).fetchall()
+            notify_change('inventory', [*updates, *(item_id for item_id, name, barcode in new_items)])
+        for item_id, name, barcode in new_items:
+            self.by_name.setdefault(name, item_id)
+            if barcode:
+                self.remember_barcode(item_id, barcode)
+        self.updated += len(updates)
+        self.inserted += len(new_items)
+
+def import_inventory(job, file_name, add_quantity=True):
+    # Background job; the reader is picked from the file extension.
+    # Returns the InventoryImport with inserted and updated counts and rejected (line number, reason) rows.
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in READERS:
+        raise InvalidImportFile(f'Unsupported file type: {extension or file_name}')
+    rows = READERS[extension](file_name)
+    headers, total = next(rows)
+    positions = {column_key(header): position for position, header in enumerate(headers)}
+    missing = [column for column in REQUIRED_COLUMNS if column not in positions]
+    if missing:
+        raise InvalidImportFile(f"Missing column(s): {', '.join(missing)}. "
+                                f"Expected {', '.join(REQUIRED_COLUMNS + OPTIONAL_COLUMNS)}.")
+    result = InventoryImport(add_quantity)
+    chunk = []
+    read = 0
+    # Line 1 is the header row, as a spreadsheet numbers it
+    for line_number, values in enumerate(rows, 2):
+        read += 1
+        if not any(text(value) for value in values):
+            continue
+        try:
+            chunk.append(parse_row(values, positions))
+        except ValueError as e:
+            result.rejected.append((line_number, str(e)))
+        if len(chunk) >= IMPORT_CHUNK_ROWS:
+            result.write_chunk(chunk)
+            chunk = []
+            job.progress(read, max(total, read))
+    if chunk:
+        result.write_chunk(chunk)
+    job.progress(read, read)
+    return result
+
+def write_rejects(file_name, rejected):
+    with open(file_name, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['line', 'reason'])
+        writer.writerows(rejected)
+    return file_name
@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import traceback
+
+import db
+from backends import DEFAULT_POOL_SIZE, SharedSQLiteBackend, SqlServerBackend
+from changes import ChangeWatcher
+from db import CONFIG_DIR
+
+STORAGE_CONFIG_FILE = os.path.join(CONFIG_DIR, 'storage.json')
+DEFAULT_STORAGE_CONFIG = {
+    # type is 'sqlite' (config/localdb.sqlite), 'sqlserver' (connection_string, pool_size)
+    # or 'shared_sqlite' (file, pool_size), a pooled SQLite file standing in for a server
+    'backend': {
+        'type': 'sqlite'
+    },
+    'pragmas': {
+        'journal_mode': 'wal',
+        # NORMAL only fsyncs at checkpoints in WAL mode; a crash can lose the last commits but never corrupts
+        'synchronous': 'normal',
+        # Negative values are KiB rather than pages
+        'cache_size': -20000,
+        'mmap_size': 268435456,
+        'temp_store': 'memory',
+        # Milliseconds a connection waits for another till's write lock before SQLITE_BUSY; db.retry_busy reruns after that
+        'busy_timeout': 5000
+    },
+    'checkpoint_interval_seconds': 300,
+    'optimize_interval_seconds': 3600,
+    # Seconds between checks for commits by other processes on the same SQLite file, e.g. other tills;
+    # 0 turns the check off. Each check is one PRAGMA, but every change it sees reloads open views in full.
+    'watch_interval_seconds': 0
+}
+
+def load_storage_config():
+    # Missing keys fall back to the defaults; a missing file is created with them
+    if not os.path.exists(STORAGE_CONFIG_FILE):
+        with open(STORAGE_CONFIG_FILE, 'w') as f:
+            json.dump(DEFAULT_STORAGE_CONFIG, f, indent=2)
+    with open(STORAGE_CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+    return {
+        **DEFAULT_STORAGE_CONFIG,
+        **config,
+        'pragmas': {**DEFAULT_STORAGE_CONFIG['pragmas'], **config.get('pragmas', {})},
+        'backend': {**DEFAULT_STORAGE_CONFIG['backend'], **config.get('backend', {})}
+    }
+
+class MaintenanceScheduler(threading.Thread):
+    # Checkpoints the WAL and refreshes planner statistics off the Tk thread
+    def __init__(self, checkpoint_interval, optimize_interval):
+        super().__init__(name='sqlite-maintenance', daemon=True)
+        self.checkpoint_interval = checkpoint_interval
+        self.optimize_interval = optimize_interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        # A connection of its own: a pooled one would be held for good, starving the worker jobs
+        conn = db.backend().open()
+        since_optimize = 0
+        try:
+            while not self.stopped.wait(self.checkpoint_interval):
+                since_optimize += self.checkpoint_interval
+                try:
+                    # PASSIVE never waits on readers or writers, so tills are not blocked
+                    conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+                    if since_optimize >= self.optimize_interval:
+                        since_optimize = 0
+                        conn.execute('PRAGMA optimize')
+                except Exception:
+                    # Tried again next interval rather than ending maintenance for the session
+                    traceback.print_exc()
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.stopped.set()
+
+def configure_backend(config):
+    settings = config['backend']
+    pool_size = settings.get('pool_size', DEFAULT_POOL_SIZE)
+    if settings['type'] == 'sqlserver':
+        db.use_backend(SqlServerBackend(settings['connection_string'], pool_size))
+    elif settings['type'] == 'shared_sqlite':
+        db.use_backend(SharedSQLiteBackend(settings.get('file', db.LOCALDB_FILE), config['pragmas'], pool_size))
+    else:
+        db.configure(config['pragmas'])
+
+def configure_storage():
+    # Applies config/storage.json to every connection and starts background maintenance
+    # and change watching. Returns the started threads; none when the server looks after itself.
+    config = load_storage_config()
+    configure_backend(config)
+    if db.backend().name != 'sqlite':
+        return []
+    services = [MaintenanceScheduler(config['checkpoint_interval_seconds'], config['optimize_interval_seconds'])]
+    if config['watch_interval_seconds']:
+        services.append(ChangeWatcher(db.backend().open, config['watch_interval_seconds']))
+    for service in services:
+        service.start()
+    return services
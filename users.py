@@ -0,0 +1,64 @@
+import hashlib
+import hmac
+import os
+
+from repository import find_user_credentials, insert_user, set_user_password, update_user
+
+PASSWORD_HASH_ALGORITHM = 'pbkdf2_sha256'
+# PBKDF2 rounds for new hashes; size with benchmarks/bench_password_hash.py against login latency on the tills.
+# Existing hashes are re-derived at this cost the next time their user logs in.
+PASSWORD_HASH_ITERATIONS = 600_000
+SALT_BYTES = 16
+
+def hash_password(password, iterations=None):
+    # Stored as algorithm$iterations$salt$hash, so the cost can change without invalidating old hashes
+    iterations = iterations or PASSWORD_HASH_ITERATIONS
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f'{PASSWORD_HASH_ALGORITHM}${iterations}${salt.hex()}${digest.hex()}'
+
+def _parse_hash(stored):
+    algorithm, iterations, salt, digest = stored.split('$')
+    if algorithm != PASSWORD_HASH_ALGORITHM:
+        raise ValueError(f'Unknown password hash {algorithm}')
+    return int(iterations), bytes.fromhex(salt), bytes.fromhex(digest)
+
+def is_password_hash(stored):
+    try:
+        _parse_hash(stored)
+        return True
+    except (AttributeError, ValueError):
+        return False
+
+def verify_password(password, stored):
+    if not is_password_hash(stored):
+        return False
+    iterations, salt, digest = _parse_hash(stored)
+    return hmac.compare_digest(hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations), digest)
+
+def needs_rehash(stored, iterations=None):
+    return _parse_hash(stored)[0] != (iterations or PASSWORD_HASH_ITERATIONS)
+
+# Checked against when the username is unknown, so a wrong name takes as long as a wrong password;
+# made on first use rather than at import, which would slow startup by a whole hash
+_unknown_user_hash = None
+
+def authenticate(username, password):
+    # One lookup on the unique username index; returns the User, or None for bad credentials
+    global _unknown_user_hash
+    found = find_user_credentials(username)
+    if found is None and _unknown_user_hash is None:
+        _unknown_user_hash = hash_password('')
+    user, stored = found if found else (None, _unknown_user_hash)
+    if not verify_password(password, stored) or user is None:
+        return None
+    if needs_rehash(stored):
+        set_user_password(user.id, hash_password(password))
+    return user
+
+def create_user(username, password, role):
+    return insert_user(username, hash_password(password), role)
+
+def change_user(user_id, role, password=None):
+    # password None keeps the current one
+    update_user(user_id, role, hash_password(password) if password else None)
@@ -0,0 +1,174 @@
+import bisect
+from tkinter import ttk
+
+from repository import (
+    count_rows, fetch_page, key_at_offset, query_sell_history, sell_history_cursor, sell_history_cursor_at, sell_history_filter
+)
+
+# Rows kept fetched beyond each edge of the visible window
+OVERSCAN_ROWS = 40
+# Rows moved per mouse-wheel notch
+WHEEL_ROWS = 3
+DEFAULT_ROW_HEIGHT = 20
+
+class AnchoredSource:
+    # Rows in a fixed order, paged by keyset. Subclasses supply count(), seek(after, skip),
+    # page(after, limit) and key(row); after is None before the first row.
+    def reset(self):
+        # anchors[position] is the key just before that position, so paging can resume there
+        self.anchors = {0: None}
+        self.anchor_positions = [0]
+
+    def add_anchor(self, position, key):
+        if position not in self.anchors:
+            self.anchors[position] = key
+            bisect.insort(self.anchor_positions, position)
+
+    def rows(self, offset, limit):
+        if offset in self.anchors:
+            after = self.anchors[offset]
+        else:
+            # Seek from the closest known anchor rather than from the start
+            nearest = self.anchor_positions[bisect.bisect_right(self.anchor_positions, offset) - 1]
+            after = self.seek(self.anchors[nearest], offset - nearest - 1)
+            if after is None:
+                # Offset lies past the last row
+                return []
+            self.add_anchor(offset, after)
+        rows = self.page(after, limit)
+        if rows:
+            self.add_anchor(offset + len(rows), self.key(rows[-1]))
+        return rows
+
+class KeysetSource(AnchoredSource):
+    # Rows of one table in id order; the first column fetched must be id
+    def __init__(self, table, columns, where='', params=()):
+        self.table = table
+        self.columns = columns
+        self.where = where
+        self.params = tuple(params)
+        self.reset()
+
+    def count(self):
+        return count_rows(self.table, self.where, self.params)
+
+    def seek(self, after, skip):
+        return key_at_offset(self.table, skip, after, self.where, self.params)
+
+    def page(self, after, limit):
+        return fetch_page(self.table, self.columns, after, limit, self.where, self.params)
+
+    def key(self, row):
+        return row[0]
+
+class SellHistorySource(AnchoredSource):
+    # SaleRecords matching sell_history_filter's filters, in timestamp order
+    def __init__(self, sort='newest', **filters):
+        self.sort = sort
+        self.filters = filters
+        self.reset()
+
+    def count(self):
+        where, params = sell_history_filter(**self.filters)
+        return count_rows('sell_history', where, params)
+
+    def seek(self, after, skip):
+        return sell_history_cursor_at(skip, after, self.sort, **self.filters)
+
+    def page(self, after, limit):
+        return query_sell_history(after, limit, self.sort, **self.filters)[0]
+
+    def key(self, row):
+        return sell_history_cursor(row)
+
+class VirtualTable(ttk.Frame):
+    # Treeview that only holds the rows currently on screen; render(position, row) gives their values
+    def __init__(self, master, columns, source, render=None, height=15, column_width=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.source = source
+        self.render = render or (lambda position, row: row)
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=height)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            if column_width:
+                self.tree.column(col, anchor='center', stretch=True, width=column_width)
+            else:
+                self.tree.column(col, anchor='center')
+        self.yscrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.xscrollbar = ttk.Scrollbar(self, orient='horizontal', command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.xscrollbar.set)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.yscrollbar.grid(row=0, column=1, sticky='ns')
+        self.xscrollbar.grid(row=1, column=0, sticky='ew')
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.visible = height
+        self.first = 0
+        self.total = 0
+        self.cache_start = 0
+        self.cache = []
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<MouseWheel>', self.on_wheel)
+        self.tree.bind('<Button-4>', lambda event: self.yview('scroll', -WHEEL_ROWS, 'units'))
+        self.tree.bind('<Button-5>', lambda event: self.yview('scroll', WHEEL_ROWS, 'units'))
+        self.refresh()
+
+    def set_source(self, source):
+        # Shows another query, e.g. after a filter change, from the top
+        self.source = source
+        self.first = 0
+        self.refresh()
+
+    def refresh(self):
+        # Re-count and re-read the source, keeping the scroll position where possible
+        self.source.reset()
+        self.total = self.source.count()
+        self.cache = []
+        self.draw()
+
+    def row_height(self):
+        return int(ttk.Style().lookup('Treeview', 'rowheight') or DEFAULT_ROW_HEIGHT)
+
+    def on_resize(self, event):
+        # One row's worth of height is taken by the heading
+        visible = max(event.height // self.row_height() - 1, 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.draw()
+
+    def on_wheel(self, event):
+        self.yview('scroll', -WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS, 'units')
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * self.total)
+        elif args[0] == 'scroll':
+            step = self.visible if args[2] == 'pages' else 1
+            self.first += int(args[1]) * step
+        self.draw()
+
+    def window(self):
+        end = self.first + self.visible
+        cache_end = self.cache_start + len(self.cache)
+        if self.first < self.cache_start or (end > cache_end and cache_end < self.total):
+            self.cache_start = max(self.first - OVERSCAN_ROWS, 0)
+            self.cache = self.source.rows(self.cache_start, self.visible + 2 * OVERSCAN_ROWS)
+        return self.cache[self.first - self.cache_start:end - self.cache_start]
+
+    def draw(self):
+        self.first = max(min(self.first, self.total - self.visible), 0)
+        rows = self.window()
+        # Existing tree items are reused so scrolling only rewrites their values
+        existing = self.tree.get_children()
+        for offset, row in enumerate(rows):
+            values = self.render(self.first + offset, row)
+            if offset < len(existing):
+                self.tree.item(existing[offset], values=values)
+            else:
+                self.tree.insert('', 'end', values=values)
+        if len(existing) > len(rows):
+            self.tree.delete(*existing[len(rows):])
+        if self.total:
+            self.yscrollbar.set(self.first / self.total, (self.first + len(rows)) / self.total)
+        else:
+            self.yscrollbar.set(0, 1)
@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+import db
+
+# How often the Tk thread drains callbacks posted by background jobs
+POLL_INTERVAL_MS = 50
+WORKER_THREADS = 2
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    # Handed to the job function so it can report progress and notice cancellation
+    def __init__(self, worker, on_progress=None):
+        self.worker = worker
+        self.on_progress = on_progress
+        self.cancelled = threading.Event()
+        self.last_progress = 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise JobCancelled()
+
+    def progress(self, done, total=None):
+        # Also the natural place for a long loop to stop once cancelled
+        self.check()
+        now = time.monotonic()
+        # Posting every row of a long loop would flood the Tk thread
+        if self.on_progress and (now - self.last_progress >= POLL_INTERVAL_MS / 1000 or done == total):
+            self.last_progress = now
+            self.worker.post(self.on_progress, done, total)
+
+def show_error(error):
+    messagebox.showerror('Error', str(error))
+
+class BackgroundWorker:
+    # Runs fn(job, *args, **kwargs) on a thread pool; every callback runs on the Tk thread via root.after polling
+    def __init__(self, root, threads=WORKER_THREADS):
+        self.root = root
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='inventory-worker')
+        self.results = queue.SimpleQueue()
+        self.root.after(POLL_INTERVAL_MS, self.poll)
+
+    def submit(self, fn, *args, on_done=None, on_error=show_error, on_progress=None, **kwargs):
+        job = Job(self, on_progress)
+        def run():
+            try:
+                result = fn(job, *args, **kwargs)
+            except JobCancelled:
+                return
+            except Exception as e:
+                self.post(on_error, e)
+                return
+            finally:
+                # A pooled database connection goes back for the other threads between jobs
+                db.release_connection()
+            if on_done and not job.cancelled.is_set():
+                self.post(on_done, result)
+        self.executor.submit(run)
+        return job
+
+    def post(self, callback, *args):
+        self.results.put((callback, args))
+
+    def poll(self):
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            # One failing callback must not stop the polling, nor the callbacks queued behind it
+            try:
+                callback(*args)
+            except Exception as e:
+                show_error(e)
+        self.root.after(POLL_INTERVAL_MS, self.poll)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)